@@ -3,29 +3,40 @@ Project Orpheus - Production API Backend
 FastAPI-based REST API for music generation service
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Iterable
 import uvicorn
 import uuid
 import os
+import asyncio
+import functools
 import sys
 import json
+import threading
+import time
+import secrets
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from transformers import MusicgenForConditionalGeneration, AutoProcessor
-import scipy.io.wavfile
 import numpy as np
 
 from planner import MusicPlanner
 from lyrics import LyricGenerator
 from audio_processor import AudioProcessor
-from audio_stitcher import AudioStitcher
+from audio_stitcher import AudioStitcher, DEFAULT_BPM
+from waveform import WaveformAnalyzer
+from cache import LRUCache
+from job_queue import create_job_store
+from storage import OutputStorage
+from audio_codes import capture_audio_codes, code_key, load_codes, save_codes
+from duration import (MUSICGEN_FRAME_RATE, MUSICGEN_NUM_CODEBOOKS, ComputeEstimator,
+                      StreamingTrackWriter, plan_duration)
 
 app = FastAPI(title="Project Orpheus API", version="1.0.0")
 
@@ -42,29 +53,119 @@ app.add_middleware(
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Global state
-print("Loading models...")
-processor = AutoProcessor.from_pretrained("facebook/musicgen-small")
-model = MusicgenForConditionalGeneration.from_pretrained("facebook/musicgen-small")
+# MODEL_NAME may point at a stereo variant (e.g. facebook/musicgen-stereo-small)
+MODEL_NAME = os.environ.get("MODEL_NAME", "facebook/musicgen-small")
+
+# Deployment mode:
+#   standalone - this process serves HTTP and generates (default)
+#   api        - serve HTTP only; jobs are enqueued for workers (no model loaded)
+#   worker     - load the model and run jobs pulled from the queue (see worker.py)
+MODE = os.environ.get("ORPHEUS_MODE", "standalone")
+
+# Shared job store: "memory", "sqlite:///path/jobs.db" or "redis://host:6379/0".
+# api and worker nodes must point at the same store and the same OUTPUT_DIR.
+JOB_STORE_URL = os.environ.get("ORPHEUS_JOB_STORE", "memory")
+if MODE in ("api", "worker") and JOB_STORE_URL == "memory":
+    # Nothing outside this process could ever claim the queued jobs
+    raise SystemExit(f"ORPHEUS_MODE={MODE} needs a shared ORPHEUS_JOB_STORE (sqlite:///... or redis://...)")
+
+# Startup warmup: run a generation at every token budget before reporting ready
+WARMUP = os.environ.get("ORPHEUS_WARMUP", "1") == "1"
+
+# Compile the decoder forward pass with torch.compile (PyTorch 2.x)
+COMPILE_DECODER = os.environ.get("ORPHEUS_COMPILE", "0") == "1"
+
+# Track length (seconds) for each duration preset; requests may give an
+# exact duration_sec instead. Segments and tokens are derived (see plan_request)
+DURATION_PRESETS = {
+    "short": 5.0,
+    "medium": 24.0,
+    "long": 36.0
+}
+
+# Longest track a request may ask for, and longest audio per generate() call
+MAX_DURATION_SEC = float(os.environ.get("ORPHEUS_MAX_DURATION_SEC", "600"))
+MAX_SEGMENT_SEC = float(os.environ.get("ORPHEUS_SEGMENT_SEC", "15"))
+
+# Crossfade range between segments; the stitcher picks each length from how
+# well the segment edges match, and the token budget assumes the longest
+MIN_CROSSFADE_SEC = 1.0
+MAX_CROSSFADE_SEC = 3.0
+
+# Set once the model is loaded and warm; /ready reports it to load balancers
+ready = threading.Event()
+
+if MODE != "api":
+    import torch
+    from transformers import MusicgenForConditionalGeneration, AutoProcessor
+    
+    print("Loading models...")
+    processor = AutoProcessor.from_pretrained(MODEL_NAME)
+    model = MusicgenForConditionalGeneration.from_pretrained(MODEL_NAME)
+else:
+    processor = model = None
+    print("API mode: generation is delegated to workers")
+    ready.set()
+
 planner = MusicPlanner()
 lyric_gen = LyricGenerator()
 audio_proc = AudioProcessor(sample_rate=32000)
 stitcher = AudioStitcher(sample_rate=32000)
+waveform = WaveformAnalyzer(sample_rate=32000)
 print("Models loaded successfully!")
 
-# Output directory
-OUTPUT_DIR = Path("outputs")
-OUTPUT_DIR.mkdir(exist_ok=True)
+# Conditioning string -> tokenized processor inputs
+conditioning_cache = LRUCache(maxsize=256)
+
+# Generation timings (warmup and real segments) -> compute time estimates.
+# Workers publish theirs to the job store under this name for the API nodes
+compute_estimator = ComputeEstimator()
+COMPUTE_TIMINGS_META = "compute_timings"
+
+# Serializes model.generate (global torch RNG seeding and the code-capture hook)
+generation_lock = threading.Lock()
+
+# Output directory (shared storage in api/worker mode)
+OUTPUT_DIR = Path(os.environ.get("ORPHEUS_OUTPUT_DIR", "outputs"))
+OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+# Job storage and queue
+jobs = create_job_store(JOB_STORE_URL)
 
-# In-memory job storage
-jobs = {}
+def _env_float(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+# Output lifecycle: sharded layout plus optional size/age quotas (unset = keep forever)
+max_gb = _env_float("ORPHEUS_STORAGE_MAX_GB")
+max_age_hours = _env_float("ORPHEUS_STORAGE_MAX_AGE_HOURS")
+storage = OutputStorage(
+    OUTPUT_DIR,
+    max_bytes=int(max_gb * 1024 ** 3) if max_gb else None,
+    max_age_sec=max_age_hours * 3600 if max_age_hours else None,
+    gc_interval=_env_float("ORPHEUS_STORAGE_GC_INTERVAL") or 300.0,
+    on_evict=lambda job_id: jobs.update(job_id, {"status": "expired"}) if job_id in jobs else None
+)
+EXPIRED_MESSAGE = "Audio was removed by storage cleanup"
 
 class GenerationRequest(BaseModel):
     prompt: str
     use_lyrics: bool = True
-    duration: str = "short"  # "short" (~10s), "medium" (~30s), "long" (~2min)
+    duration: str = "short"  # Preset: "short" (~5s), "medium" (~24s), "long" (~36s)
+    # Exact length in seconds; overrides the preset. Validated here so every
+    # endpoint that budgets a request (/plan, /generate) is covered
+    duration_sec: Optional[float] = Field(None, ge=1.0, le=MAX_DURATION_SEC)
     apply_fades: bool = True
     normalize: bool = True
     plan: Optional[dict] = None
+    # Random per job when omitted; reported in metadata. Segment i samples with
+    # seed + i and the dither RNG needs a non-negative seed, so keep it in range
+    seed: Optional[int] = Field(None, ge=0, lt=2 ** 63)
+
+class RenderRequest(BaseModel):
+    """Post-processing options for re-rendering a finished job."""
+    apply_fades: Optional[bool] = None
+    normalize: Optional[bool] = None
 
 class GenerationResponse(BaseModel):
     job_id: str
@@ -72,6 +173,44 @@ class GenerationResponse(BaseModel):
     audio_url: Optional[str] = None
     metadata: Optional[dict] = None
 
+# Blocking job-store and filesystem calls run here, off the event loop
+io_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("ORPHEUS_IO_THREADS", "8")),
+    thread_name_prefix="orpheus-io"
+)
+
+# Generation jobs run one at a time on their own thread, so they never take
+# threads from the pool serving requests
+generation_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="orpheus-generation")
+
+async def run_io(func, *args):
+    """Run a blocking call on the I/O executor without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(func, *args))
+
+@app.on_event("startup")
+async def start_storage_gc():
+    """Start the output garbage collector alongside the server."""
+    storage.start()
+
+@app.on_event("startup")
+async def start_warmup():
+    """Warm the model in the background; /ready turns 200 when it finishes."""
+    if not ready.is_set():
+        threading.Thread(target=warmup, name="orpheus-warmup", daemon=True).start()
+
+@app.on_event("shutdown")
+async def flush_io():
+    """Let queued file writes finish before the process exits."""
+    io_executor.shutdown(wait=True)
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 503 until the model is loaded and warmed up."""
+    if not ready.is_set():
+        raise HTTPException(status_code=503, detail="Warming up")
+    return {"ready": True, "mode": MODE}
+
 @app.get("/")
 async def root():
     """Serve the home page."""
@@ -84,36 +223,89 @@ async def generator_page():
 
 @app.post("/plan")
 async def get_plan(request: GenerationRequest):
-    """Return a song plan for the given prompt without generating audio."""
+    """Return a song plan and duration budget for the given prompt without generating audio."""
     plan = planner.plan(request.prompt)
-    return {"plan": plan}
+    return {"plan": plan, "duration": await run_io(plan_request, request)}
+
+@app.get("/stats")
+async def get_stats():
+    """Hit/miss statistics for the plan and conditioning caches."""
+    return {
+        "plan_cache": planner.plan_cache.stats(),
+        "conditioning_cache": conditioning_cache.stats(),
+        "storage": await run_io(storage.usage)
+    }
 
 @app.post("/generate", response_model=GenerationResponse)
-async def generate_music(request: GenerationRequest, background_tasks: BackgroundTasks):
+async def generate_music(request: GenerationRequest):
     """
     Generate music from a text prompt.
     Returns a job ID immediately; processing happens in background.
     """
+    # Segment/token budget and estimated compute time, reported up front
+    budget = await run_io(plan_request, request)
+    
     # Create job
     job_id = str(uuid.uuid4())
-    jobs[job_id] = {"status": "processing", "request": request.dict()}
     
-    # Start background task
-    background_tasks.add_task(process_generation, job_id, request)
+    if MODE == "api":
+        # Hand the job to whichever worker claims it first
+        await run_io(jobs.create, job_id, {"status": "queued", "request": request.dict(), "metadata": budget})
+        await run_io(jobs.enqueue, job_id, request.dict())
+        status = "queued"
+    else:
+        # Start background task
+        await run_io(jobs.create, job_id, {"status": "processing", "request": request.dict(), "metadata": budget})
+        generation_executor.submit(process_generation, job_id, request)
+        status = "processing"
     
     return GenerationResponse(
         job_id=job_id,
-        status="processing"
+        status=status,
+        metadata=budget
+    )
+
+@app.post("/rerender/{job_id}", response_model=GenerationResponse)
+async def rerender_music(job_id: str, options: RenderRequest):
+    """
+    Re-render a finished job with different post-processing.
+    Decodes the stored audio codes instead of generating again; returns a new job ID.
+    """
+    source = await run_io(jobs.get, job_id)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if source["status"] != "completed" or not source.get("codes_path"):
+        raise HTTPException(status_code=400, detail="Job has no stored audio codes to re-render")
+    
+    # Same request as the source job, with the new post-processing options
+    request_data = dict(source["request"])
+    request_data.update(options.dict(exclude_none=True))
+    request = GenerationRequest(**request_data)
+    
+    new_job_id = str(uuid.uuid4())
+    
+    if MODE == "api":
+        await run_io(jobs.create, new_job_id, {"status": "queued", "request": request.dict(), "rerender_of": job_id})
+        await run_io(jobs.enqueue, new_job_id, {**request.dict(), "rerender_of": job_id})
+        status = "queued"
+    else:
+        await run_io(jobs.create, new_job_id, {"status": "processing", "request": request.dict(), "rerender_of": job_id})
+        generation_executor.submit(process_rerender, new_job_id, job_id, request)
+        status = "processing"
+    
+    return GenerationResponse(
+        job_id=new_job_id,
+        status=status
     )
 
 @app.get("/status/{job_id}", response_model=GenerationResponse)
 async def get_status(job_id: str):
     """Check the status of a generation job."""
-    if job_id not in jobs:
+    job = await run_io(jobs.get, job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = jobs[job_id]
-    
     response = GenerationResponse(
         job_id=job_id,
         status=job["status"]
@@ -121,29 +313,197 @@ async def get_status(job_id: str):
     
     if job["status"] == "completed":
         response.audio_url = f"/download/{job_id}"
+        response.metadata = {
+            **job.get("metadata", {}),
+            "peaks_url": f"/peaks/{job_id}",
+            "spectrogram_url": f"/spectrogram/{job_id}"
+        }
+    elif job["status"] in ("queued", "processing"):
+        # Budget, estimated compute time and progress
         response.metadata = job.get("metadata")
     elif job["status"] == "failed":
         response.metadata = {"error": job.get("error", "Unknown error")}
+    elif job["status"] == "expired":
+        response.metadata = {"error": EXPIRED_MESSAGE}
     
     return response
 
 @app.get("/download/{job_id}")
 async def download_audio(job_id: str):
     """Download the generated audio file."""
-    if job_id not in jobs:
+    job = await run_io(jobs.get, job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    job = jobs[job_id]
-    
+    if job["status"] == "expired":
+        raise HTTPException(status_code=410, detail=EXPIRED_MESSAGE)
     if job["status"] != "completed":
         raise HTTPException(status_code=400, detail="Generation not complete")
     
     filepath = job.get("filepath")
-    if not filepath or not os.path.exists(filepath):
+    if not filepath or not await run_io(os.path.exists, filepath):
         raise HTTPException(status_code=404, detail="Audio file not found")
     
+    # Downloads keep a job's files at the back of the eviction order
+    await run_io(storage.touch, job_id)
+    
     return FileResponse(filepath, media_type="audio/wav", filename=f"{job_id}.wav")
 
+@app.get("/peaks/{job_id}")
+async def get_peaks(job_id: str):
+    """Serve the precomputed waveform peaks so the UI can draw without the WAV."""
+    return await _completed_artifact(job_id, "peaks_path", "application/json")
+
+@app.get("/spectrogram/{job_id}")
+async def get_spectrogram(job_id: str):
+    """Serve the mel-spectrogram thumbnail (PNG)."""
+    return await _completed_artifact(job_id, "spectrogram_path", "image/png")
+
+async def _completed_artifact(job_id: str, key: str, media_type: str) -> FileResponse:
+    """Look up a file stored alongside a completed job's audio."""
+    job = await run_io(jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if job["status"] == "expired":
+        raise HTTPException(status_code=410, detail=EXPIRED_MESSAGE)
+    if job["status"] != "completed":
+        raise HTTPException(status_code=400, detail="Generation not complete")
+    
+    path = job.get(key)
+    if not path or not await run_io(os.path.exists, path):
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    return FileResponse(path, media_type=media_type)
+
+def tokenize_conditioning(conditioning: str):
+    """Tokenize a conditioning string, reusing cached tensors for repeats."""
+    return conditioning_cache.get_or_compute(
+        conditioning,
+        lambda: processor(
+            text=[conditioning],
+            padding=True,
+            return_tensors="pt",
+        )
+    )
+
+def compile_decoder() -> bool:
+    """
+    Compile the decoder's forward pass with torch.compile.
+    
+    Only forward is replaced, so generate() keeps using the decoder's own
+    helpers (delay pattern masks, config). Falls back to eager mode if the
+    installed torch or the CPU backend does not support it.
+    """
+    import torch
+    
+    if not hasattr(torch, "compile"):
+        print("torch.compile unavailable; using eager decoder")
+        return False
+    
+    original = model.decoder.forward
+    try:
+        # KV cache length grows every step, so compile with dynamic shapes
+        model.decoder.forward = torch.compile(original, dynamic=True)
+        # Compilation is lazy: backend errors (e.g. no C++ toolchain for
+        # inductor) only surface on the first call, so make one now
+        inputs = tokenize_conditioning("pop music, happy mood, C Major, 120 BPM, instruments: []")
+        with generation_lock:
+            model.generate(**inputs, max_new_tokens=4, do_sample=True)
+        return True
+    except Exception as e:
+        model.decoder.forward = original
+        print(f"Decoder compilation failed, using eager decoder: {e}")
+        return False
+
+def duration_budget(seconds: float) -> dict:
+    """
+    Segments and tokens per segment for a track of the given length, enough
+    even if every crossfade ends up as long as allowed.
+    """
+    if model is not None:
+        frame_rate = model.config.audio_encoder.frame_rate
+        # The codebook delay pattern costs num_codebooks - 1 decoding steps
+        delay_steps = model.decoder.config.num_codebooks - 1
+    else:
+        # API nodes have no model to ask: assume MusicGen's, as workers run
+        frame_rate, delay_steps = MUSICGEN_FRAME_RATE, MUSICGEN_NUM_CODEBOOKS - 1
+    
+    # Segments are beat-aligned while stitching, so budget whole beats
+    return plan_duration(seconds, stitcher, frame_rate=frame_rate, max_segment_sec=MAX_SEGMENT_SEC,
+                         fade_sec=MAX_CROSSFADE_SEC, delay_steps=delay_steps, beat_sec=60.0 / DEFAULT_BPM)
+
+def plan_request(request: GenerationRequest) -> dict:
+    """Duration budget for a request plus its estimated compute time."""
+    if request.duration_sec is not None:
+        seconds = request.duration_sec
+    else:
+        seconds = DURATION_PRESETS.get(request.duration, DURATION_PRESETS["short"])
+    budget = duration_budget(seconds)
+    if MODE == "api":
+        # API nodes never generate; estimate from the workers' timings
+        samples = jobs.get_meta(COMPUTE_TIMINGS_META)
+        if samples:
+            compute_estimator.load(samples)
+    # None until a generation has been timed
+    budget["estimated_compute_sec"] = compute_estimator.estimate(budget["tokens_per_segment"], budget["segments"])
+    return budget
+
+def record_timing(tokens: int, seconds: float):
+    """Feed one generate() timing to the estimator (and, on workers, to the API nodes)."""
+    compute_estimator.record(tokens, seconds)
+    if MODE == "worker":
+        jobs.set_meta(COMPUTE_TIMINGS_META, compute_estimator.samples())
+
+def warmup():
+    """
+    Run one short generation at every duration preset's token budget.
+    
+    This triggers lazy kernel initialization, allocator growth and (when
+    enabled) decoder compilation before real traffic arrives, seeds the
+    compute time estimates, then marks the instance ready.
+    """
+    if COMPILE_DECODER:
+        compile_decoder()
+    
+    if WARMUP:
+        try:
+            inputs = tokenize_conditioning("pop music, happy mood, C Major, 120 BPM, instruments: []")
+            for tokens in sorted({duration_budget(s)["tokens_per_segment"] for s in DURATION_PRESETS.values()}):
+                # Jobs may already be running (/generate is not gated on
+                # readiness); they must not see warmup's RNG use or decodes
+                with generation_lock:
+                    start = time.perf_counter()
+                    model.generate(**inputs, max_new_tokens=tokens, do_sample=True)
+                    elapsed = time.perf_counter() - start
+                record_timing(tokens, elapsed)
+                print(f"Warmup: {tokens} tokens in {elapsed:.1f}s")
+        except Exception as e:
+            # Stay unready: a model that cannot generate should not get traffic
+            print(f"Warmup failed: {e}")
+            return
+    
+    ready.set()
+    print("Model ready")
+
+def to_segment(audio_values) -> np.ndarray:
+    """Convert decoder output (batch, channels, samples) to a float32 segment."""
+    # MusicGen decodes to float32 (channels, samples); keep it that way
+    # through the pipeline and drop the channel axis for mono models
+    segment = audio_values[0].cpu().numpy().astype(np.float32, copy=False)
+    if segment.shape[0] == 1:
+        segment = segment[0]
+    return segment
+
+def decode_audio_codes(parts: List[np.ndarray]) -> np.ndarray:
+    """Decode stored codes back to audio without rerunning the decoder LM."""
+    with torch.no_grad():
+        outputs = [
+            model.audio_encoder.decode(torch.from_numpy(codes.astype(np.int64)), audio_scales=[None]).audio_values
+            for codes in parts
+        ]
+    return to_segment(torch.cat(outputs, dim=1))
+
 def process_generation(job_id: str, request: GenerationRequest):
     """Background task for music generation."""
     try:
@@ -155,84 +515,188 @@ def process_generation(job_id: str, request: GenerationRequest):
         # The conditioning describes the musical style, mood, and instruments
         conditioning = f"{plan['genre']} music, {plan['mood']} mood, {plan['key']}, {plan['bpm']} BPM, instruments: {plan['instruments']}"
         
-        # Step 3: Determine number of segments based on duration
-        duration_config = {
-            "short": {"segments": 1, "tokens": 256},      # ~8s
-            "medium": {"segments": 3, "tokens": 512},     # ~48s  
-            "long": {"segments": 3, "tokens": 768}        # ~72s with longer segments (reduced to 3 segments for fewer transitions)
-        }
+        # Step 3: Work out segments and tokens for the requested length
+        budget = plan_request(request)
+        num_segments = budget["segments"]
+        max_tokens = budget["tokens_per_segment"]
         
-        config = duration_config.get(request.duration, duration_config["short"])
-        num_segments = config["segments"]
-        max_tokens = config["tokens"]
+        # Per-job seed; segment i samples with seed + i, so the job is reproducible
+        seed = request.seed if request.seed is not None else secrets.randbits(31)
         
-        # Step 4: Generate audio segments
-        segments = []
+        # Step 4: Generate audio segments (conditioning is tokenized once per job)
+        inputs = tokenize_conditioning(conditioning)
+        codes = {}
         
-        for i in range(num_segments):
-            # Update job status with progress
-            jobs[job_id]["metadata"] = {
-                "progress": f"{i+1}/{num_segments}",
-                "current_segment": i + 1,
-                "total_segments": num_segments
-            }
-            
-            inputs = processor(
-                text=[conditioning],
-                padding=True,
-                return_tensors="pt",
-            )
-            
-            audio_values = model.generate(**inputs, max_new_tokens=max_tokens, do_sample=True)
-            segment = audio_values[0][0].cpu().numpy()
-            segments.append(segment)
-        
-        # Step 5: Stitch segments if multiple
-        if len(segments) > 1:
-            # Match loudness across segments
-            segments = stitcher.match_loudness(segments)
-            # Stitch with maximum 6-second crossfading for imperceptible transitions
-            audio_data = stitcher.stitch_segments(segments, fade_duration=6.0, use_beat_align=True)
-        else:
-            audio_data = segments[0]
-        
-        # Step 6: Post-process
-        if request.normalize or request.apply_fades:
-            audio_data = audio_proc.process(
-                audio_data,
-                normalize=request.normalize,
-                fades=request.apply_fades,
-                compress=False
-            )
-        
-        # Step 7: Save
-        filepath = OUTPUT_DIR / f"{job_id}.wav"
-        sampling_rate = model.config.audio_encoder.sampling_rate
-        
-        # Convert float32 audio to int16 for WAV compatibility
-        # MusicGen outputs float32 in range [-1, 1], we need int16 [-32768, 32767]
-        audio_int16 = (audio_data * 32767).astype(np.int16)
-        
-        scipy.io.wavfile.write(str(filepath), rate=sampling_rate, data=audio_int16)
+        def generate_segments():
+            for i in range(num_segments):
+                # Update job status with progress
+                jobs.update(job_id, {"metadata": {
+                    **budget,
+                    "progress": f"{i+1}/{num_segments}",
+                    "current_segment": i + 1,
+                    "total_segments": num_segments
+                }})
+                
+                # The torch RNG and the decode hook are process-wide, so one
+                # generation runs at a time
+                with generation_lock, capture_audio_codes(model) as captured:
+                    torch.manual_seed(seed + i)
+                    start = time.perf_counter()
+                    audio_values = model.generate(**inputs, max_new_tokens=max_tokens, do_sample=True)
+                    elapsed = time.perf_counter() - start
+                
+                record_timing(max_tokens, elapsed)
+                
+                # Codebook indices fit in int16 (codebook size 2048)
+                for j, part in enumerate(captured):
+                    codes[code_key(i, j)] = part.numpy().astype(np.int16)
+                
+                yield to_segment(audio_values)
         
-        # Update job
-        jobs[job_id].update({
-            "status": "completed",
-            "filepath": str(filepath),
+        # Segments are stitched as they are generated. The codes are saved
+        # with the audio so the job can be re-rendered without the decoder LM
+        render_job(job_id, request, plan, generate_segments(), budget["target_duration_sec"], {
+            "seed": seed,
+            "codes": codes
+        })
+        
+    except Exception as e:
+        jobs.update(job_id, {
+            "status": "failed",
+            "error": str(e)
+        })
+
+def process_rerender(job_id: str, source_job_id: str, request: GenerationRequest):
+    """Background task that re-renders a finished job from its stored codes."""
+    try:
+        source = jobs.get(source_job_id)
+        codes_path = source.get("codes_path") if source else None
+        if not codes_path or not os.path.exists(codes_path):
+            raise FileNotFoundError("Audio codes for the source job are no longer available")
+        
+        stored = load_codes(codes_path)
+        
+        def decode_segments():
+            for i, parts in enumerate(stored):
+                jobs.update(job_id, {"metadata": {
+                    "progress": f"{i+1}/{len(stored)}",
+                    "current_segment": i + 1,
+                    "total_segments": len(stored)
+                }})
+                yield decode_audio_codes(parts)
+        
+        source_metadata = source.get("metadata", {})
+        render_job(job_id, request, source_metadata.get("plan"), decode_segments(),
+                   source_metadata.get("target_duration_sec"), {
+            "seed": source_metadata.get("seed"),
+            "codes_path": codes_path,
+            "rerender_of": source_job_id
+        })
+        
+    except Exception as e:
+        jobs.update(job_id, {
+            "status": "failed",
+            "error": str(e)
+        })
+
+def render_job(job_id: str, request: GenerationRequest, plan: dict,
+               segments: Iterable[np.ndarray], target_sec: Optional[float], extra: dict):
+    """Stitch segments as they arrive, post-process and save, then mark the job completed."""
+    sampling_rate = model.config.audio_encoder.sampling_rate
+    
+    # Step 5: Stitch into a disk-backed buffer as segments arrive, so memory
+    # stays bounded however long the track. Crossfades go where the segment
+    # edges sound most alike and the track is cut to the requested length.
+    track_path = storage.path_for(job_id, ".track.f32")
+    writer = StreamingTrackWriter(
+        track_path,
+        stitcher,
+        audio_proc,
+        fade_duration=MAX_CROSSFADE_SEC,
+        min_fade_duration=MIN_CROSSFADE_SEC,
+        normalize=request.normalize,
+        fades=request.apply_fades,
+        max_samples=round(target_sec * sampling_rate) if target_sec else None
+    )
+    try:
+        for segment in segments:
+            writer.add(segment)
+        
+        # Step 6: Post-process (normalize from the running peak, fades) in place
+        audio_data = writer.finish()
+        
+        # Step 7: Precompute waveform overview for the UI
+        peaks = waveform.compute_peaks(audio_data)
+        spectrogram = waveform.spectrogram_png(audio_data)
+        
+        record = {
+            "codes_path": extra.get("codes_path"),
             "metadata": {
                 "prompt": request.prompt,
                 "plan": plan,
-                "duration_sec": len(audio_data) / sampling_rate,
+                "duration_sec": audio_data.shape[-1] / sampling_rate,
+                "target_duration_sec": target_sec,
                 "sample_rate": sampling_rate,
-                "num_segments": num_segments
+                "channels": 1 if audio_data.ndim == 1 else audio_data.shape[0],
+                "num_segments": writer.num_segments,
+                "seed": extra.get("seed"),
+                **({"rerender_of": extra["rerender_of"]} if "rerender_of" in extra else {})
             }
+        }
+        
+        # Step 8: Save on the I/O executor; the generation thread moves on to
+        # the next job while the files are written
+        io_executor.submit(save_artifacts, job_id, audio_data, sampling_rate,
+                           peaks, spectrogram, extra.get("codes"), record, track_path)
+    except BaseException:
+        # Generation, decoding or rendering failed: drop the partial track
+        writer.abort()
+        raise
+
+def save_artifacts(job_id: str, audio_data: np.ndarray, sampling_rate: int,
+                   peaks: dict, spectrogram: bytes, codes: Optional[dict], record: dict,
+                   track_path: Path):
+    """Write a rendered job's files, then mark it completed."""
+    try:
+        if codes is not None:
+            codes_path = storage.path_for(job_id, ".codes.npz")
+            save_codes(codes_path, codes)
+            record["codes_path"] = str(codes_path)
+        
+        # Convert float32 audio in [-1, 1] to 16-bit PCM, written chunk by chunk
+        # straight into a memory-mapped WAV file (no full-length int16 copy)
+        filepath = storage.path_for(job_id, ".wav")
+        # Dither is seeded from the job seed, so a re-render with the same
+        # options reproduces the file byte for byte
+        audio_proc.write_wav(str(filepath), audio_data, sample_rate=sampling_rate,
+                             dither_seed=record["metadata"].get("seed"))
+        
+        # The WAV replaces the float32 working copy
+        del audio_data
+        track_path.unlink()
+        
+        peaks_path = storage.path_for(job_id, ".peaks.json")
+        with open(peaks_path, "w") as f:
+            json.dump(peaks, f, separators=(",", ":"))
+        
+        spectrogram_path = storage.path_for(job_id, ".spectrogram.png")
+        spectrogram_path.write_bytes(spectrogram)
+        
+        # Update job
+        jobs.update(job_id, {
+            "status": "completed",
+            "filepath": str(filepath),
+            "peaks_path": str(peaks_path),
+            "spectrogram_path": str(spectrogram_path),
+            **record
         })
         
     except Exception as e:
-        jobs[job_id].update({
+        jobs.update(job_id, {
             "status": "failed",
             "error": str(e)
         })
+        track_path.unlink(missing_ok=True)
 
 if __name__ == "__main__":
     print("\n" + "="*60)
@@ -0,0 +1,108 @@
+"""
+Mono vs Stereo Post-Processing Benchmark
+Times the render path render_job runs after generation (streaming stitch and
+post-process, waveform peaks and spectrogram, WAV export) on mono and stereo
+segments. Stereo should cost less than twice mono.
+
+Run from the project root:
+    python benchmarks/bench_multichannel.py
+
+Timings are medians over REPEATS runs, each on its own copy of the segments.
+
+Stereo arrays cross glibc's mmap threshold sooner than mono ones, so on
+small machines fresh page faults can dominate the stereo timing. Setting
+MALLOC_MMAP_THRESHOLD_ / MALLOC_TRIM_THRESHOLD_ high removes that noise.
+"""
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from audio_processor import AudioProcessor
+from audio_stitcher import AudioStitcher
+from duration import StreamingTrackWriter
+from waveform import WaveformAnalyzer
+
+SAMPLE_RATE = 32000
+SEGMENT_SEC = 16.0
+NUM_SEGMENTS = 3
+REPEATS = 15
+
+
+def make_segments(channels: int):
+    """Create float32 test segments shaped (samples,) or (channels, samples)."""
+    rng = np.random.default_rng(0)
+    num_samples = int(SEGMENT_SEC * SAMPLE_RATE)
+    shape = (num_samples,) if channels == 1 else (channels, num_samples)
+    return [(rng.standard_normal(shape) * 0.2).astype(np.float32) for _ in range(NUM_SEGMENTS)]
+
+
+def run_pipeline(stitcher: AudioStitcher, proc: AudioProcessor, waveform: WaveformAnalyzer,
+                 segments, workdir: str) -> np.ndarray:
+    """
+    The stages render_job runs, with the same crossfade settings.
+
+    Returns:
+        The finished track (a memory map over the working file)
+    """
+    writer = StreamingTrackWriter(os.path.join(workdir, "track.f32"), stitcher, proc,
+                                  fade_duration=3.0, min_fade_duration=1.0)
+    for segment in segments:
+        writer.add(segment)
+    track = writer.finish()
+
+    waveform.compute_peaks(track)
+    waveform.spectrogram_png(track)
+    proc.write_wav(os.path.join(workdir, "track.wav"), track, dither_seed=0)
+    return track
+
+
+def median_time(fn, setup=lambda: ()) -> float:
+    """Median wall-clock time of fn(*setup()) over REPEATS runs (setup untimed)."""
+    fn(*setup())  # warm up
+    times = []
+    for _ in range(REPEATS):
+        args = setup()
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+if __name__ == "__main__":
+    stitcher = AudioStitcher(sample_rate=SAMPLE_RATE)
+    proc = AudioProcessor(sample_rate=SAMPLE_RATE)
+    waveform = WaveformAnalyzer(sample_rate=SAMPLE_RATE)
+    workdir = tempfile.mkdtemp()
+    
+    mono = make_segments(1)
+    stereo = make_segments(2)
+    
+    def render(segments):
+        return run_pipeline(stitcher, proc, waveform, segments, workdir)
+    
+    # Each run gets its own copy of the segments, made outside the timing
+    mono_time = median_time(render, lambda: ([seg.copy() for seg in mono],))
+    stereo_time = median_time(render, lambda: ([seg.copy() for seg in stereo],))
+    
+    print(f"Segments: {NUM_SEGMENTS} x {SEGMENT_SEC:.0f}s @ {SAMPLE_RATE} Hz")
+    print("\nRender (loudness, adaptive crossfade, beat align, normalize, fades, peaks, spectrogram, WAV)")
+    print(f"  Mono:   {mono_time * 1000:8.1f} ms")
+    print(f"  Stereo: {stereo_time * 1000:8.1f} ms")
+    print(f"  Stereo / mono cost: {stereo_time / mono_time:.2f}x")
+    
+    # Resampling is FIR filtering, so its cost scales with the sample count;
+    # reported separately since render_job does not resample
+    mono_track = np.array(render([seg.copy() for seg in mono]))
+    stereo_track = np.array(render([seg.copy() for seg in stereo]))
+    mono_time = median_time(lambda: proc.resample(mono_track, 48000))
+    stereo_time = median_time(lambda: proc.resample(stereo_track, 48000))
+    
+    print("\nResample 32 kHz -> 48 kHz")
+    print(f"  Mono:   {mono_time * 1000:8.1f} ms")
+    print(f"  Stereo: {stereo_time * 1000:8.1f} ms")
+    print(f"  Stereo / mono cost: {stereo_time / mono_time:.2f}x")
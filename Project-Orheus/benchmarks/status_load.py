@@ -0,0 +1,97 @@
+"""
+/status Latency Under Generation Load
+Polls /status from many concurrent clients while a generation saturates the
+CPU, then again once the server is idle, and compares the latency
+percentiles. With the async request path the two should stay close.
+
+Start the server first (standalone mode, model loaded), then run from the
+project root:
+    python benchmarks/status_load.py --url http://localhost:8000
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+
+
+def request_json(url: str, body: dict = None) -> dict:
+    """GET (or POST a JSON body) and decode the JSON response."""
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def poll_status(url: str, clients: int, duration: float, stop: threading.Event = None) -> List[float]:
+    """
+    Hit url from `clients` threads for `duration` seconds (or until stop is set).
+
+    Returns:
+        Latencies in milliseconds
+    """
+    deadline = time.monotonic() + duration
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def client():
+        local = []
+        while time.monotonic() < deadline and not (stop and stop.is_set()):
+            start = time.perf_counter()
+            with urllib.request.urlopen(url, timeout=30) as response:
+                response.read()
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for _ in range(clients):
+            pool.submit(client)
+
+    return latencies
+
+
+def report(label: str, latencies: List[float]) -> None:
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"  {label:<18} n={len(latencies):6d}  p50={p50:7.2f} ms  p95={p95:7.2f} ms  p99={p99:7.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10.0, help="Length of each measurement phase")
+    parser.add_argument("--duration", default="medium", help="Duration preset for the load job")
+    args = parser.parse_args()
+
+    # A job to poll; its status record is what /status reads in both phases
+    job = request_json(f"{args.url}/generate", {"prompt": "upbeat electronic track", "duration": args.duration})
+    status_url = f"{args.url}/status/{job['job_id']}"
+    print(f"Polling {status_url} with {args.clients} clients")
+
+    # Phase 1: while the job generates (CPU saturated)
+    done = threading.Event()
+
+    def watch():
+        while request_json(status_url)["status"] in ("queued", "processing"):
+            time.sleep(0.5)
+        done.set()
+
+    threading.Thread(target=watch, daemon=True).start()
+    busy = poll_status(status_url, args.clients, args.seconds, stop=done)
+    if done.is_set():
+        print("Warning: generation finished during the busy phase; use a longer --duration")
+
+    # Phase 2: idle baseline once the job is finished
+    done.wait()
+    idle = poll_status(status_url, args.clients, args.seconds)
+
+    print("\n/status latency")
+    report("idle", idle)
+    report("during generation", busy)
+    print(f"\n  p99 ratio (busy / idle): {np.percentile(busy, 99) / np.percentile(idle, 99):.2f}x")
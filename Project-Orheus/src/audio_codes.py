@@ -0,0 +1,66 @@
+"""
+Audio Code Storage
+Captures the EnCodec codes MusicGen decodes into audio, and saves and loads
+them so a finished job can be re-rendered without rerunning the decoder LM.
+"""
+
+import re
+from contextlib import contextmanager
+from typing import Dict, List
+
+import numpy as np
+
+# One array per decode call: "segment<i>_part<j>"
+_CODE_KEY = re.compile(r"^segment(\d+)_part(\d+)$")
+
+
+@contextmanager
+def capture_audio_codes(model):
+    """
+    Record the codes model.generate() hands to model.audio_encoder.decode.
+
+    Stereo models decode left and right codebooks in two calls, so the
+    captured list holds one tensor per call, in order. The hook is
+    process-wide: hold the generation lock while it is installed.
+    """
+    captured = []
+    original = model.audio_encoder.decode
+
+    def decode(audio_codes, *args, **kwargs):
+        captured.append(audio_codes.detach().cpu())
+        return original(audio_codes, *args, **kwargs)
+
+    model.audio_encoder.decode = decode
+    try:
+        yield captured
+    finally:
+        model.audio_encoder.decode = original
+
+
+def code_key(segment: int, part: int) -> str:
+    """Archive key for one decode call's codes."""
+    return f"segment{segment}_part{part}"
+
+
+def save_codes(path, codes: Dict[str, np.ndarray]) -> None:
+    """Write codes keyed by code_key() to a compressed .npz archive."""
+    np.savez_compressed(path, **codes)
+
+
+def load_codes(path) -> List[List[np.ndarray]]:
+    """
+    Read an archive written by save_codes().
+
+    Returns:
+        One list per segment, in order, holding that segment's parts in order
+    """
+    grouped: Dict[int, Dict[int, np.ndarray]] = {}
+    with np.load(path) as stored:
+        for name in stored.files:
+            match = _CODE_KEY.match(name)
+            if not match:
+                raise ValueError(f"{path}: unexpected entry {name!r}")
+            segment, part = int(match.group(1)), int(match.group(2))
+            grouped.setdefault(segment, {})[part] = stored[name]
+
+    return [[parts[j] for j in sorted(parts)] for _, parts in sorted(grouped.items())]
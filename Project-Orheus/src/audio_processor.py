@@ -1,11 +1,19 @@
 """
 Audio Post-Processing Module
 Enhances generated audio with normalization, fade effects, and format conversion.
+
+All methods accept mono ``(samples,)`` or multi-channel ``(channels, samples)``
+arrays; time is always the last axis and channels are handled by broadcasting.
 """
 
+import struct
+from math import gcd
 import numpy as np
 from scipy import signal
-from typing import Tuple
+from typing import Optional, Tuple
+
+# 16-bit PCM full scale
+PCM16_SCALE = 32767.0
 
 class AudioProcessor:
     """Post-processing tools for generated audio."""
@@ -13,19 +21,21 @@ class AudioProcessor:
     def __init__(self, sample_rate: int = 32000):
         self.sample_rate = sample_rate
     
-    def normalize(self, audio: np.ndarray, target_db: float = -3.0) -> np.ndarray:
+    def normalize(self, audio: np.ndarray, target_db: float = -3.0, copy: bool = True) -> np.ndarray:
         """
         Normalize audio to target loudness in dB.
         
         Args:
-            audio: Audio array (1D)
+            audio: Audio array, (samples,) or (channels, samples)
             target_db: Target peak level in dB (negative value)
+            copy: If False, modify ``audio`` in place
         
         Returns:
             Normalized audio
         """
-        # Calculate current peak
-        current_peak = np.abs(audio).max()
+        # Calculate current peak across all channels (no temporary |audio| copy;
+        # max and min read each block while it is still in cache)
+        current_peak = max((max(block.max(), -block.min()) for block in self._blocks(audio)), default=0)
         
         if current_peak == 0:
             return audio
@@ -33,69 +43,89 @@ class AudioProcessor:
         # Convert target dB to linear scale
         target_linear = 10 ** (target_db / 20.0)
         
-        # Calculate gain needed
-        gain = target_linear / current_peak
+        # Calculate gain needed (kept in the audio dtype to avoid float64 promotion)
+        gain = audio.dtype.type(target_linear / current_peak)
         
-        # Apply gain
-        normalized = audio * gain
+        # Apply gain and clip to prevent distortion, a cache-sized block at a
+        # time so each block is read once for both
+        normalized = audio.copy() if copy else audio
+        for block in self._blocks(normalized):
+            block *= gain
+            np.clip(block, -1.0, 1.0, out=block)
         
-        # Clip to prevent distortion
-        return np.clip(normalized, -1.0, 1.0)
+        return normalized
     
-    def fade_in(self, audio: np.ndarray, fade_duration: float = 0.5) -> np.ndarray:
+    def _blocks(self, audio: np.ndarray, block_size: int = 1 << 16):
+        """
+        Yield writable views of about block_size samples (all channels) along time.
+        
+        Elementwise stages run block by block so their temporaries stay in
+        cache; otherwise a stereo track falls out of cache where a mono one
+        still fits, and costs more than twice as much.
+        """
+        step = max(1, block_size // max(1, audio.size // max(1, audio.shape[-1])))
+        for start in range(0, audio.shape[-1], step):
+            yield audio[..., start:start + step]
+    
+    def fade_in(self, audio: np.ndarray, fade_duration: float = 0.5, copy: bool = True) -> np.ndarray:
         """
         Apply fade-in effect.
         
         Args:
             audio: Audio array
             fade_duration: Fade duration in seconds
+            copy: If False, modify ``audio`` in place
         
         Returns:
             Audio with fade-in
         """
         fade_samples = int(fade_duration * self.sample_rate)
-        fade_samples = min(fade_samples, len(audio))
+        fade_samples = min(fade_samples, audio.shape[-1])
         
-        # Create fade curve (linear)
-        fade_curve = np.linspace(0, 1, fade_samples)
+        # Create fade curve (linear), shared by all channels
+        fade_curve = np.linspace(0, 1, fade_samples, dtype=audio.dtype)
         
         # Apply fade
-        result = audio.copy()
-        result[:fade_samples] *= fade_curve
+        result = audio.copy() if copy else audio
+        if fade_samples > 0:
+            result[..., :fade_samples] *= fade_curve
         
         return result
     
-    def fade_out(self, audio: np.ndarray, fade_duration: float = 1.0) -> np.ndarray:
+    def fade_out(self, audio: np.ndarray, fade_duration: float = 1.0, copy: bool = True) -> np.ndarray:
         """
         Apply fade-out effect.
         
         Args:
             audio: Audio array
             fade_duration: Fade duration in seconds
+            copy: If False, modify ``audio`` in place
         
         Returns:
             Audio with fade-out
         """
         fade_samples = int(fade_duration * self.sample_rate)
-        fade_samples = min(fade_samples, len(audio))
+        fade_samples = min(fade_samples, audio.shape[-1])
         
-        # Create fade curve (linear)
-        fade_curve = np.linspace(1, 0, fade_samples)
+        # Create fade curve (linear), shared by all channels
+        fade_curve = np.linspace(1, 0, fade_samples, dtype=audio.dtype)
         
         # Apply fade
-        result = audio.copy()
-        result[-fade_samples:] *= fade_curve
+        result = audio.copy() if copy else audio
+        if fade_samples > 0:
+            result[..., -fade_samples:] *= fade_curve
         
         return result
     
     def apply_fades(self, audio: np.ndarray, 
                    fade_in_duration: float = 0.5,
-                   fade_out_duration: float = 1.0) -> np.ndarray:
+                   fade_out_duration: float = 1.0,
+                   copy: bool = True) -> np.ndarray:
         """
         Apply both fade-in and fade-out.
         """
-        result = self.fade_in(audio, fade_in_duration)
-        result = self.fade_out(result, fade_out_duration)
+        result = self.fade_in(audio, fade_in_duration, copy=copy)
+        result = self.fade_out(result, fade_out_duration, copy=False)
         return result
     
     def resample(self, audio: np.ndarray, target_rate: int) -> Tuple[np.ndarray, int]:
@@ -112,18 +142,22 @@ class AudioProcessor:
         if target_rate == self.sample_rate:
             return audio, self.sample_rate
         
-        # Calculate resampling ratio
-        ratio = target_rate / self.sample_rate
-        num_samples = int(len(audio) * ratio)
+        # Reduce the rate ratio to up/down integer factors (e.g. 32k -> 48k is 3/2)
+        divisor = gcd(target_rate, self.sample_rate)
+        up = target_rate // divisor
+        down = self.sample_rate // divisor
         
-        # Use scipy's resampling
-        resampled = signal.resample(audio, num_samples)
+        # Polyphase resampling along the time axis, all channels in one call.
+        # Unlike FFT resampling its cost does not depend on the track length
+        # factorizing nicely.
+        resampled = signal.resample_poly(audio, up, down, axis=-1).astype(audio.dtype, copy=False)
         
         return resampled, target_rate
     
     def compress_dynamic_range(self, audio: np.ndarray, 
                                threshold: float = 0.5,
-                               ratio: float = 4.0) -> np.ndarray:
+                               ratio: float = 4.0,
+                               copy: bool = True) -> np.ndarray:
         """
         Simple dynamic range compression (limiter).
         
@@ -131,30 +165,34 @@ class AudioProcessor:
             audio: Input audio
             threshold: Compression threshold (0-1)
             ratio: Compression ratio
+            copy: If False, modify ``audio`` in place
         
         Returns:
             Compressed audio
         """
         # Simple soft clipping above threshold
-        output = audio.copy()
-        
-        # Find samples above threshold
-        above_threshold = np.abs(output) > threshold
-        
-        # Apply compression
-        if np.any(above_threshold):
-            excess = np.abs(output[above_threshold]) - threshold
-            compressed_excess = excess / ratio
+        output = audio.copy() if copy else audio
+        amount = output.dtype.type(1.0 - 1.0 / ratio)
+        
+        for block in self._blocks(output):
+            # Amount each sample exceeds the threshold (zero below it)
+            excess = np.abs(block)
+            excess -= threshold
+            np.maximum(excess, 0, out=excess)
             
-            # Apply with sign preservation
-            output[above_threshold] = np.sign(output[above_threshold]) * (threshold + compressed_excess)
+            # Remove (1 - 1/ratio) of the excess with sign preservation, which
+            # leaves threshold + excess / ratio above the threshold. Branch-free,
+            # so every channel goes through the same elementwise ops.
+            excess *= amount
+            block -= np.copysign(excess, block, out=excess)
         
         return output
     
     def process(self, audio: np.ndarray, 
                normalize: bool = True,
                fades: bool = True,
-               compress: bool = False) -> np.ndarray:
+               compress: bool = False,
+               copy: bool = True) -> np.ndarray:
         """
         Apply full processing pipeline.
         
@@ -163,22 +201,92 @@ class AudioProcessor:
             normalize: Apply normalization
             fades: Apply fade in/out
             compress: Apply compression
+            copy: If False and ``audio`` is already float32, process it in place
         
         Returns:
-            Processed audio
+            Processed audio (float32)
         """
-        result = audio.copy()
+        # Single float32 working buffer; every stage below runs in place on it
+        result = np.array(audio, dtype=np.float32) if copy else np.asarray(audio, dtype=np.float32)
         
         if compress:
-            result = self.compress_dynamic_range(result)
+            result = self.compress_dynamic_range(result, copy=False)
         
         if normalize:
-            result = self.normalize(result, target_db=-3.0)
+            result = self.normalize(result, target_db=-3.0, copy=False)
         
         if fades:
-            result = self.apply_fades(result)
+            result = self.apply_fades(result, copy=False)
         
         return result
+    
+    def write_wav(self, path: str, audio: np.ndarray,
+                  sample_rate: Optional[int] = None,
+                  dither: bool = True,
+                  chunk_size: int = 65536,
+                  dither_seed: Optional[int] = None) -> None:
+        """
+        Write float audio in [-1, 1] to a 16-bit PCM WAV file.
+        
+        The header is written up front and the sample data is filled in
+        through a memory map, one chunk at a time, so the full-length int16
+        copy of the track is never held in memory.
+        
+        Args:
+            path: Output file path
+            audio: Float audio array, (samples,) or (channels, samples)
+            sample_rate: Sample rate written to the header (defaults to self.sample_rate)
+            dither: Add TPDF dither before quantizing
+            chunk_size: Number of samples converted per chunk
+            dither_seed: Seed for the dither noise (None for fresh noise each call)
+        """
+        sample_rate = sample_rate or self.sample_rate
+        audio = np.asarray(audio, dtype=np.float32)
+        
+        # Planar (channels, samples) view; mono becomes a single channel
+        planar = audio.reshape(-1, audio.shape[-1])
+        num_channels, num_samples = planar.shape
+        block_align = num_channels * 2
+        data_bytes = num_samples * block_align
+        
+        # Canonical 44-byte PCM header: RIFF chunk, fmt chunk, data chunk
+        header = struct.pack(
+            '<4sI4s4sIHHIIHH4sI',
+            b'RIFF', 36 + data_bytes, b'WAVE',
+            b'fmt ', 16, 1, num_channels, sample_rate, sample_rate * block_align, block_align, 16,
+            b'data', data_bytes
+        )
+        
+        with open(path, 'wb') as f:
+            f.write(header)
+            f.truncate(len(header) + data_bytes)
+        
+        if num_samples == 0:
+            return
+        
+        # WAV stores frames interleaved: (samples, channels)
+        pcm = np.memmap(path, dtype='<i2', mode='r+', offset=len(header),
+                        shape=(num_samples, num_channels))
+        scratch = np.empty((min(chunk_size, num_samples), num_channels), dtype=np.float32)
+        rng = np.random.default_rng(dither_seed)
+        
+        for start in range(0, num_samples, chunk_size):
+            end = min(start + chunk_size, num_samples)
+            buf = scratch[:end - start]
+            
+            # Interleave, scale, dither, clip and round in the float32 scratch buffer
+            np.multiply(planar[:, start:end].T, PCM16_SCALE, out=buf)
+            if dither:
+                # Triangular dither of +/- 1 LSB
+                buf += rng.random(buf.shape, dtype=np.float32)
+                buf -= rng.random(buf.shape, dtype=np.float32)
+            np.clip(buf, -32768.0, 32767.0, out=buf)
+            np.rint(buf, out=buf)
+            
+            pcm[start:end] = buf
+        
+        pcm.flush()
+        del pcm
 
 
 if __name__ == "__main__":
@@ -187,7 +295,7 @@ if __name__ == "__main__":
     
     # Create test signal (5 seconds)
     duration = 5.0
-    t = np.linspace(0, duration, int(duration * processor.sample_rate))
+    t = np.linspace(0, duration, int(duration * processor.sample_rate), dtype=np.float32)
     test_audio = np.sin(2 * np.pi * 440 * t) * 0.8  # 440 Hz sine wave
     
     print("Testing AudioProcessor...")
@@ -201,8 +309,13 @@ if __name__ == "__main__":
     with_fades = processor.apply_fades(test_audio)
     print(f"With fades: start={with_fades[0]:.3f}, end={with_fades[-1]:.3f}")
     
+    # Test stereo (channels, samples)
+    stereo = np.stack([test_audio, test_audio * 0.5])
+    processed_stereo = processor.process(stereo)
+    print(f"Stereo processed: shape={processed_stereo.shape}, start={processed_stereo[:, 0]}")
+    
     # Test full pipeline
     processed = processor.process(test_audio)
-    print(f"Fully processed: peak={np.abs(processed).max():.3f}")
+    print(f"Fully processed: peak={np.abs(processed).max():.3f}, dtype={processed.dtype}")
     
     print("\nAll tests passed!")
@@ -1,18 +1,150 @@
 """
 Audio Stitching Utilities
 Combines multiple audio segments into longer songs with crossfading
+
+Segments may be mono ``(samples,)`` or multi-channel ``(channels, samples)``;
+time is always the last axis.
 """
 
 import numpy as np
 import scipy.io.wavfile
 from typing import List, Tuple
 
+# Tempo assumed for beat alignment until real tempo detection lands
+DEFAULT_BPM = 120.0
+
 class AudioStitcher:
     """Combines audio segments into longer tracks."""
     
     def __init__(self, sample_rate: int = 32000):
         self.sample_rate = sample_rate
     
+    def _crossfade_curves(self, fade_samples: int, dtype) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Build the (fade_out, fade_in) curve pair for a crossfade.
+        
+        The curves are 1-D and broadcast across every channel of the overlap.
+        """
+        # Create ultra-smooth equal-power crossfade curves
+        # This ensures constant perceived loudness during transition
+        t = np.linspace(0, np.pi / 2, fade_samples, dtype=dtype)
+        
+        # Equal-power crossfade with extra smoothing (maintains constant energy)
+        fade_out = (np.cos(t) ** 2.0) * 0.9 + 0.1  # Very gentle fade out, never goes to zero
+        fade_in = (np.sin(t) ** 2.0) * 0.9 + 0.1   # Very gentle fade in, starts from non-zero
+        
+        # Normalize to ensure proper volume
+        norm_factor = fade_out + fade_in
+        fade_out /= norm_factor
+        fade_in /= norm_factor
+        
+        return fade_out, fade_in
+    
+    def fade_length(self, fade_duration: float, len1: int, len2: int) -> int:
+        """Crossfade length in samples, using up to 1/3 of each segment."""
+        return min(int(fade_duration * self.sample_rate), len1 // 3, len2 // 3)
+    
+    def blend_into(self, tail: np.ndarray, head: np.ndarray) -> np.ndarray:
+        """
+        Crossfade the outgoing tail into the incoming head, in place.
+        
+        Args:
+            tail: Last samples of the outgoing segment
+            head: First samples of the incoming segment, same length as tail;
+                overwritten with the crossfade
+        
+        Returns:
+            head
+        """
+        fade_out, fade_in = self._crossfade_curves(head.shape[-1], head.dtype)
+        head *= fade_in
+        head += tail * fade_out
+        return head
+    
+    def _band_spectra(self, audio: np.ndarray, n_fft: int, hop: int, bands: int = 24) -> np.ndarray:
+        """
+        Short-time log band energies, one unit-norm row per frame.
+        
+        Bands are log-spaced so low and high frequencies weigh about equally;
+        rows are mean-centred, so a dot product of two rows is a correlation.
+        """
+        mono = audio.reshape(-1, audio.shape[-1]).mean(axis=0, dtype=np.float32)
+        frames = np.lib.stride_tricks.sliding_window_view(mono, n_fft)[::hop]
+        power = np.abs(np.fft.rfft(frames * np.hanning(n_fft).astype(np.float32), axis=-1)) ** 2
+        
+        edges = np.unique(np.geomspace(1, power.shape[-1], bands + 1).astype(int))[:-1]
+        features = np.log10(np.add.reduceat(power, edges, axis=-1) + 1e-10)
+        features -= features.mean(axis=-1, keepdims=True)
+        return features / np.maximum(np.linalg.norm(features, axis=-1, keepdims=True), 1e-8)
+    
+    def choose_crossfade(self, audio1: np.ndarray, audio2: np.ndarray,
+                         min_fade: float = 1.0, max_fade: float = 3.0,
+                         hop: int = 1024, tolerance: float = 0.02) -> int:
+        """
+        Pick the crossfade length, and so where audio2 enters, from spectral similarity.
+        
+        Every overlap between min_fade and max_fade (in hop steps) is scored
+        by the mean correlation of the band spectra of audio1's tail and
+        audio2's head as they would line up in the crossfade. The best
+        alignment wins; near ties go to the shortest overlap, which keeps
+        the most audio.
+        
+        Args:
+            audio1: Outgoing segment
+            audio2: Incoming segment
+            min_fade: Shortest crossfade in seconds
+            max_fade: Longest crossfade in seconds (still capped at 1/3 of each segment)
+            hop: Analysis hop in samples (frames are 2 * hop long)
+            tolerance: Score margin within which a shorter overlap is preferred
+        
+        Returns:
+            Crossfade length in samples
+        """
+        n_fft = 2 * hop
+        max_samples = self.fade_length(max_fade, audio1.shape[-1], audio2.shape[-1])
+        
+        # A crossfade of (f + 1) * hop samples lines up f frames of each side
+        min_frames = max(1, int(min_fade * self.sample_rate) // hop - 1)
+        max_frames = max_samples // hop - 1
+        if max_frames <= min_frames:
+            return max_samples
+        
+        span = (max_frames + 1) * hop
+        tail = self._band_spectra(audio1[..., -span:], n_fft, hop)
+        head = self._band_spectra(audio2[..., :span], n_fft, hop)
+        similarity = tail @ head.T
+        
+        # For f overlapping frames, tail frame (max_frames - f + j) sits on
+        # head frame j: a sub-diagonal of the similarity matrix
+        candidates = np.arange(min_frames, max_frames + 1)
+        scores = np.array([np.trace(similarity, offset=f - max_frames) / f for f in candidates])
+        best = candidates[np.argmax(scores >= scores.max() - tolerance)]
+        
+        return int((best + 1) * hop)
+    
+    def usable_duration(self, segment_duration: float, num_segments: int, fade_duration: float) -> float:
+        """
+        Stitched length of num_segments equal segments when every crossfade
+        is as long as allowed (fade_duration, capped at 1/3 of a segment).
+        With adaptive crossfades this is the shortest the track can be.
+        """
+        fade = min(fade_duration, segment_duration / 3)
+        return num_segments * segment_duration - (num_segments - 1) * fade
+    
+    def segment_duration_for(self, target_duration: float, num_segments: int, fade_duration: float) -> float:
+        """
+        Shortest segment length whose stitched track reaches target_duration
+        (the inverse of usable_duration).
+        """
+        if num_segments <= 1:
+            return target_duration
+        
+        segment = (target_duration + (num_segments - 1) * fade_duration) / num_segments
+        if fade_duration > segment / 3:
+            # The 1/3 cap binds, so each overlap is a third of a segment
+            segment = target_duration / (num_segments - (num_segments - 1) / 3)
+        return segment
+    
     def crossfade(self, audio1: np.ndarray, audio2: np.ndarray, fade_duration: float = 6.0) -> np.ndarray:
         """
         Crossfade between two audio segments using ultra-smooth equal-power curves.
@@ -25,48 +157,46 @@ class AudioStitcher:
         Returns:
             Seamlessly crossfaded audio
         """
-        fade_samples = int(fade_duration * self.sample_rate)
-        fade_samples = min(fade_samples, len(audio1) // 3, len(audio2) // 3)  # Use up to 1/3 of each segment
-        
-        # Create ultra-smooth equal-power crossfade curves
-        # This ensures constant perceived loudness during transition
-        t = np.linspace(0, np.pi / 2, fade_samples)
-        
-        # Equal-power crossfade with extra smoothing (maintains constant energy)
-        fade_out = (np.cos(t) ** 2.0) * 0.9 + 0.1  # Very gentle fade out, never goes to zero
-        fade_in = (np.sin(t) ** 2.0) * 0.9 + 0.1   # Very gentle fade in, starts from non-zero
+        len1, len2 = audio1.shape[-1], audio2.shape[-1]
+        fade_samples = self.fade_length(fade_duration, len1, len2)
         
-        # Normalize to ensure proper volume
-        norm_factor = fade_out + fade_in
-        fade_out = fade_out / norm_factor
-        fade_in = fade_in / norm_factor
+        dtype = np.result_type(audio1.dtype, audio2.dtype, np.float32)
+        fade_out, fade_in = self._crossfade_curves(fade_samples, dtype)
         
-        # Apply equal-power crossfade
-        overlap = audio1[-fade_samples:] * fade_out + audio2[:fade_samples] * fade_in
+        # Combine segments into a single preallocated buffer
+        channel_shape = np.broadcast_shapes(audio1.shape[:-1], audio2.shape[:-1])
+        head = len1 - fade_samples
+        result = np.empty(channel_shape + (head + len2,), dtype=dtype)
+        result[..., :head] = audio1[..., :head]
+        result[..., head + fade_samples:] = audio2[..., fade_samples:]
         
-        # Combine segments
-        result = np.concatenate([
-            audio1[:-fade_samples],
-            overlap,
-            audio2[fade_samples:]
-        ])
+        # Apply equal-power crossfade directly into the overlap region
+        # (the 1-D curves broadcast across every channel)
+        overlap = result[..., head:head + fade_samples]
+        np.multiply(audio1[..., head:], fade_out, out=overlap)
+        overlap += audio2[..., :fade_samples] * fade_in
         
         return result
     
-    def stitch_segments(self, segments: List[np.ndarray], fade_duration: float = 6.0, use_beat_align: bool = True) -> np.ndarray:
+    def stitch_segments(self, segments: List[np.ndarray], fade_duration: float = 6.0, use_beat_align: bool = True,
+                        adaptive: bool = False, min_fade_duration: float = 1.0) -> np.ndarray:
         """
         Stitch multiple audio segments together with seamless crossfading.
         
         Args:
             segments: List of audio segments
-            fade_duration: Crossfade duration between segments (default 6.0s for ultra-smooth transitions)
+            fade_duration: Crossfade duration between segments (default 6.0s for ultra-smooth transitions);
+                the longest crossfade when adaptive
             use_beat_align: Whether to align segments to beat grid
+            adaptive: Choose each crossfade between min_fade_duration and fade_duration
+                from the spectral similarity of the segment edges (see choose_crossfade)
+            min_fade_duration: Shortest adaptive crossfade
         
         Returns:
             Seamlessly combined audio track
         """
         if not segments:
-            return np.array([])
+            return np.array([], dtype=np.float32)
         
         if len(segments) == 1:
             return segments[0]
@@ -75,34 +205,68 @@ class AudioStitcher:
         if use_beat_align and len(segments) > 1:
             segments = self.align_segments_to_beat(segments)
         
-        result = segments[0]
+        # Work out every crossfade up front so the whole track is written into
+        # one buffer, instead of re-copying the growing result per segment
+        lengths = [seg.shape[-1] for seg in segments]
+        fades = []
+        total = lengths[0]
+        for previous, segment, length in zip(segments, segments[1:], lengths[1:]):
+            if adaptive:
+                fade_samples = self.choose_crossfade(previous, segment, min_fade_duration, fade_duration)
+            else:
+                fade_samples = self.fade_length(fade_duration, total, length)
+            fades.append(fade_samples)
+            total += length - fade_samples
+        
+        dtype = np.result_type(*[seg.dtype for seg in segments], np.float32)
+        channel_shape = np.broadcast_shapes(*[seg.shape[:-1] for seg in segments])
+        result = np.empty(channel_shape + (total,), dtype=dtype)
+        
+        result[..., :lengths[0]] = segments[0]
+        end = lengths[0]
         
         # Stitch each segment with long crossfade
-        for segment in segments[1:]:
-            result = self.crossfade(result, segment, fade_duration)
+        for segment, length, fade_samples in zip(segments[1:], lengths[1:], fades):
+            start = end - fade_samples
+            fade_out, fade_in = self._crossfade_curves(fade_samples, dtype)
+            
+            # Equal-power crossfade in place over the tail already written
+            overlap = result[..., start:end]
+            overlap *= fade_out
+            overlap += segment[..., :fade_samples] * fade_in
+            
+            result[..., end:start + length] = segment[..., fade_samples:]
+            end = start + length
         
         return result
     
-    def match_loudness(self, segments: List[np.ndarray]) -> List[np.ndarray]:
+    def match_loudness(self, segments: List[np.ndarray], copy: bool = True) -> List[np.ndarray]:
         """
         Normalize loudness across all segments for consistency.
         
         Args:
             segments: List of audio segments
+            copy: If False, scale the segments in place
         
         Returns:
             Loudness-matched segments
         """
-        # Calculate RMS for each segment
-        rms_values = [np.sqrt(np.mean(seg**2)) for seg in segments]
+        # Calculate RMS for each segment over all channels; vdot flattens
+        # multi-channel arrays and avoids a squared temporary
+        rms_values = [np.sqrt(np.vdot(seg, seg) / seg.size) if seg.size else 0.0 for seg in segments]
         target_rms = np.mean(rms_values)
         
         # Normalize each segment
         matched_segments = []
         for seg, rms in zip(segments, rms_values):
             if rms > 0:
-                gain = target_rms / rms
-                matched_segments.append(seg * gain)
+                # Cast the gain to the segment dtype so float32 stays float32
+                gain = seg.dtype.type(target_rms / rms)
+                if copy:
+                    seg = seg * gain
+                else:
+                    seg *= gain
+                matched_segments.append(seg)
             else:
                 matched_segments.append(seg)
         
@@ -118,7 +282,7 @@ class AudioStitcher:
         # In production, use librosa.beat.beat_track
         
         # For now, return a default
-        return 120.0
+        return DEFAULT_BPM
     
     def estimate_beat_phase(self, audio: np.ndarray) -> float:
         """
@@ -147,25 +311,28 @@ class AudioStitcher:
         if target_bpm is None:
             target_bpm = self.analyze_tempo(segments[0])
         
+        # Align each segment to nearest beat boundary
+        return [self.fit_to_beat(seg, target_bpm) for seg in segments]
+    
+    def fit_to_beat(self, segment: np.ndarray, bpm: float) -> np.ndarray:
+        """
+        Pad or trim one segment to the nearest whole number of beats.
+        """
         # Calculate beat duration
-        beat_duration = 60.0 / target_bpm
+        beat_duration = 60.0 / bpm
         samples_per_beat = int(beat_duration * self.sample_rate)
         
-        # Align each segment to nearest beat boundary
-        aligned = []
-        for seg in segments:
-            # Round length to nearest beat
-            target_length = round(len(seg) / samples_per_beat) * samples_per_beat
-            
-            if target_length > len(seg):
-                # Pad with silence
-                padding = np.zeros(target_length - len(seg))
-                aligned.append(np.concatenate([seg, padding]))
-            else:
-                # Trim to beat boundary
-                aligned.append(seg[:target_length])
+        # Round length to nearest beat
+        num_samples = segment.shape[-1]
+        target_length = round(num_samples / samples_per_beat) * samples_per_beat
+        
+        if target_length > num_samples:
+            # Pad with silence
+            padding = np.zeros(segment.shape[:-1] + (target_length - num_samples,), dtype=segment.dtype)
+            return np.concatenate([segment, padding], axis=-1)
         
-        return aligned
+        # Trim to beat boundary
+        return segment[..., :target_length]
 
 
 if __name__ == "__main__":
@@ -179,7 +346,7 @@ if __name__ == "__main__":
     # Generate test segments with different frequencies
     segments = []
     for i, freq in enumerate([440, 550, 660]):
-        t = np.linspace(0, duration, num_samples)
+        t = np.linspace(0, duration, num_samples, dtype=np.float32)
         segment = np.sin(2 * np.pi * freq * t) * 0.5
         segments.append(segment)
     
@@ -194,10 +361,21 @@ if __name__ == "__main__":
     # Stitch with crossfade
     result = stitcher.stitch_segments(matched, fade_duration=1.0)
     expected_length = (len(segments) * duration - (len(segments) - 1) * 1.0)
-    actual_length = len(result) / 32000
+    actual_length = result.shape[-1] / 32000
     
     print(f"Expected length: ~{expected_length:.1f}s")
     print(f"Actual length: {actual_length:.1f}s")
-    print(f"Result shape: {result.shape}")
+    print(f"Result shape: {result.shape}, dtype: {result.dtype}")
+    
+    # Stereo segments stitch the same way, channels first
+    stereo = stitcher.stitch_segments([np.stack([seg, seg]) for seg in matched], fade_duration=1.0)
+    print(f"Stereo result shape: {stereo.shape}")
+    
+    # Adaptive crossfades and the matching segment budget
+    adaptive = stitcher.stitch_segments(matched, fade_duration=3.0, adaptive=True)
+    segment_duration = stitcher.segment_duration_for(24.0, 3, 3.0)
+    print(f"Adaptive result length: {adaptive.shape[-1] / 32000:.1f}s")
+    print(f"Segment length for a 24s track: {segment_duration:.1f}s "
+          f"(usable: {stitcher.usable_duration(segment_duration, 3, 3.0):.1f}s)")
     
     print("\nAll tests passed!")
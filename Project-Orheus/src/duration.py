@@ -0,0 +1,302 @@
+"""
+Duration Engine
+Turns a requested track length into a segment and token budget, builds the
+track incrementally on disk as segments are generated, and estimates
+compute time from observed generation timings.
+"""
+
+import math
+import threading
+from collections import deque
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from audio_processor import AudioProcessor
+from audio_stitcher import AudioStitcher
+
+# MusicGen's EnCodec runs at 50 frames (tokens) per second of 32 kHz audio
+MUSICGEN_FRAME_RATE = 50
+
+# Codebooks per frame in the mono MusicGen checkpoints; the delay pattern
+# adds num_codebooks - 1 decoding steps to every generation
+MUSICGEN_NUM_CODEBOOKS = 4
+
+
+def plan_duration(target_sec: float,
+                  stitcher: AudioStitcher,
+                  frame_rate: float = MUSICGEN_FRAME_RATE,
+                  max_segment_sec: float = 15.0,
+                  fade_sec: float = 3.0,
+                  delay_steps: int = 0,
+                  beat_sec: Optional[float] = None) -> dict:
+    """
+    Work out how to generate a track of (at least) target_sec seconds.
+
+    Uses the fewest segments no longer than max_segment_sec, assuming every
+    crossfade is as long as allowed, and the shortest segment length that
+    still reaches the target. With beat_sec, segments are rounded up to
+    whole beats, so beat alignment (which rounds each segment to the nearest
+    beat) never makes them shorter than planned.
+
+    Args:
+        target_sec: Requested track length in seconds
+        stitcher: Stitcher whose overlap rules apply
+        frame_rate: Decoder tokens per second of audio
+        max_segment_sec: Longest segment to generate in one pass
+        fade_sec: Longest crossfade between segments
+        delay_steps: Extra decoding steps per segment (codebook delay pattern)
+        beat_sec: Beat length used by beat alignment, if segments are aligned
+
+    Returns:
+        Dict with target_duration_sec, segments, segment_sec, tokens_per_segment
+    """
+    if target_sec <= 0 or max_segment_sec <= 0:
+        raise ValueError("target_sec and max_segment_sec must be positive")
+
+    # n * max_segment - (n - 1) * fade >= target, with fade capped at a third
+    # of a segment; the loop only absorbs floating-point rounding
+    fade = min(fade_sec, max_segment_sec / 3)
+    num_segments = max(1, math.ceil((target_sec - fade) / (max_segment_sec - fade)))
+    while stitcher.usable_duration(max_segment_sec, num_segments, fade_sec) < target_sec:
+        num_segments += 1
+
+    segment_sec = stitcher.segment_duration_for(target_sec, num_segments, fade_sec)
+    if beat_sec:
+        segment_sec = math.ceil(segment_sec / beat_sec - 1e-9) * beat_sec
+
+    return {
+        "target_duration_sec": target_sec,
+        "segments": num_segments,
+        "segment_sec": segment_sec,
+        "tokens_per_segment": math.ceil(segment_sec * frame_rate) + delay_steps,
+    }
+
+
+class StreamingTrackWriter:
+    """
+    Builds a track on disk from segments as they are generated.
+
+    Each add() crossfades the new segment onto the previous one and appends
+    everything before the next crossfade to a raw float32 file, so at most
+    two segments are held in memory however long the track gets. finish()
+    then normalizes from the running peak and applies the fades in place.
+    This gives the same result as match_loudness + stitch_segments +
+    process, except that loudness is matched to the running mean RMS of the
+    segments so far.
+    """
+
+    def __init__(self, path: Union[str, Path],
+                 stitcher: AudioStitcher,
+                 processor: AudioProcessor,
+                 fade_duration: float = 3.0,
+                 min_fade_duration: float = 1.0,
+                 adaptive: bool = True,
+                 use_beat_align: bool = True,
+                 match_loudness: bool = True,
+                 normalize: bool = True,
+                 fades: bool = True,
+                 target_db: float = -3.0,
+                 max_samples: Optional[int] = None):
+        """
+        Args:
+            path: Raw float32 file the track is written to, frames interleaved
+            stitcher: Provides crossfade selection, curves and beat alignment
+            processor: Provides fades
+            fade_duration: Longest crossfade (the fixed length when not adaptive)
+            min_fade_duration: Shortest adaptive crossfade
+            adaptive: Choose crossfades from edge similarity (see AudioStitcher.choose_crossfade)
+            use_beat_align: Fit every segment to whole beats once there are two or more
+            match_loudness: Scale segments to the running mean RMS
+            normalize: Scale the finished track to target_db peak
+            fades: Fade in the first segment and fade out the last
+            target_db: Peak level for normalization
+            max_samples: Cut the track at this length (before the fade-out); segments
+                are budgeted for the longest crossfades, so shorter ones leave extra audio
+        """
+        self.path = Path(path)
+        self.stitcher = stitcher
+        self.processor = processor
+        self.fade_duration = fade_duration
+        self.min_fade_duration = min_fade_duration
+        self.adaptive = adaptive
+        self.use_beat_align = use_beat_align
+        self.match_loudness = match_loudness
+        self.normalize = normalize
+        self.fades = fades
+        self.target_db = target_db
+        self.max_samples = max_samples
+
+        self.num_segments = 0
+        self.samples_written = 0
+        self.peak = 0.0
+
+        self._file = open(self.path, "wb")
+        self._pending: Optional[np.ndarray] = None  # newest segment, head already crossfaded
+        self._rms_total = 0.0
+        self._bpm: Optional[float] = None
+
+    def add(self, segment: np.ndarray) -> None:
+        """Crossfade a segment onto the track, writing out what is final."""
+        segment = np.array(segment, dtype=np.float32)
+
+        if self.match_loudness:
+            rms = np.sqrt(np.vdot(segment, segment) / segment.size) if segment.size else 0.0
+            self._rms_total += rms
+            target = self._rms_total / (self.num_segments + 1)
+            if rms > 0:
+                segment *= np.float32(target / rms)
+
+        self.num_segments += 1
+
+        if self._pending is None:
+            self._pending = segment
+            return
+
+        if self.use_beat_align:
+            # Single-segment tracks are left as generated, as in stitch_segments
+            if self._bpm is None:
+                self._bpm = self.stitcher.analyze_tempo(self._pending)
+                self._pending = self.stitcher.fit_to_beat(self._pending, self._bpm)
+            segment = self.stitcher.fit_to_beat(segment, self._bpm)
+
+        previous = self._pending
+        if self.adaptive:
+            fade_samples = self.stitcher.choose_crossfade(previous, segment, self.min_fade_duration, self.fade_duration)
+        else:
+            fade_samples = self.stitcher.fade_length(self.fade_duration, previous.shape[-1], segment.shape[-1])
+
+        head = previous.shape[-1] - fade_samples
+        self._write(previous[..., :head])
+
+        # Equal-power crossfade into the head of the new segment, which stays pending
+        self.stitcher.blend_into(previous[..., head:], segment[..., :fade_samples])
+
+        self._pending = segment
+
+    def finish(self) -> np.ndarray:
+        """
+        Write the last segment, then normalize and fade the file in place.
+
+        Returns:
+            The track as a memory map over the file, (samples,) or (channels, samples)
+        """
+        if self._pending is None:
+            raise ValueError("No segments were added")
+
+        channels = self._pending.shape[:-1]
+        self._write(self._pending)
+        self._pending = None
+        self._file.close()
+
+        # Stored frame by frame: (samples,) or (samples, channels)
+        frames = np.memmap(self.path, dtype=np.float32, mode="r+",
+                           shape=(self.samples_written,) + channels)
+        track = frames.T if channels else frames
+
+        if self.normalize and self.peak > 0:
+            gain = np.float32(10 ** (self.target_db / 20.0) / self.peak)
+            chunk = 1 << 18
+            for start in range(0, self.samples_written, chunk):
+                frames[start:start + chunk] *= gain
+
+        if self.fades:
+            self.processor.apply_fades(track, copy=False)
+
+        frames.flush()
+        return track
+
+    def abort(self) -> None:
+        """Close and delete the partial track (after a failed generation)."""
+        self._pending = None
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+    def _write(self, block: np.ndarray) -> None:
+        """Append final samples (up to max_samples), tracking the running peak."""
+        if self.max_samples is not None:
+            block = block[..., :max(0, self.max_samples - self.samples_written)]
+        if block.shape[-1] == 0:
+            return
+        self.peak = max(self.peak, float(block.max()), float(-block.min()))
+        np.ascontiguousarray(block.T).tofile(self._file)
+        self.samples_written += block.shape[-1]
+
+
+class ComputeEstimator:
+    """
+    Predicts generation time from observed (tokens, seconds) timings.
+
+    Decoding cost is close to linear in the number of tokens, so a line
+    seconds = overhead + rate * tokens is fitted to the most recent timings
+    (warmup runs first, then real segments).
+    """
+
+    def __init__(self, window: int = 32):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, tokens: int, seconds: float) -> None:
+        """Add one timing of a single generate() call."""
+        with self._lock:
+            self._samples.append((tokens, seconds))
+
+    def samples(self) -> List[Tuple[int, float]]:
+        """The timings currently used for estimates, oldest first."""
+        with self._lock:
+            return list(self._samples)
+
+    def load(self, samples: List[Tuple[int, float]]) -> None:
+        """Replace the timings, e.g. with ones another process recorded."""
+        with self._lock:
+            self._samples.clear()
+            self._samples.extend((int(tokens), float(seconds)) for tokens, seconds in samples)
+
+    def estimate(self, tokens_per_segment: int, segments: int = 1) -> Optional[float]:
+        """
+        Expected seconds to generate every segment, or None before any timing.
+        """
+        samples = self.samples()
+        if not samples:
+            return None
+
+        tokens, seconds = np.array(samples, dtype=np.float64).T
+        if np.ptp(tokens) > 0:
+            rate, overhead = np.polyfit(tokens, seconds, 1)
+            per_segment = overhead + rate * tokens_per_segment
+        else:
+            per_segment = seconds.mean() * tokens_per_segment / tokens[0]
+
+        return max(0.0, float(per_segment)) * segments
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    stitcher = AudioStitcher(sample_rate=32000)
+    processor = AudioProcessor(sample_rate=32000)
+
+    # Budgets for a few target lengths
+    for target in (5.0, 24.0, 95.0, 300.0):
+        plan = plan_duration(target, stitcher)
+        print(f"{target:6.1f}s -> {plan['segments']} x {plan['segment_sec']:.2f}s "
+              f"({plan['tokens_per_segment']} tokens)")
+
+    # Stream a 95 s track made of generated-length segments
+    plan = plan_duration(95.0, stitcher)
+    rng = np.random.default_rng(0)
+    path = os.path.join(tempfile.mkdtemp(), "track.f32")
+    writer = StreamingTrackWriter(path, stitcher, processor, max_samples=95 * 32000)
+    for _ in range(plan["segments"]):
+        writer.add(rng.standard_normal(int(plan["segment_sec"] * 32000)).astype(np.float32) * 0.2)
+    track = writer.finish()
+    print(f"Streamed track: {track.shape[-1] / 32000:.1f}s, peak {np.abs(track).max():.3f}")
+
+    estimator = ComputeEstimator()
+    estimator.record(253, 9.8)
+    estimator.record(753, 27.5)
+    print(f"Estimated compute: {estimator.estimate(plan['tokens_per_segment'], plan['segments']):.1f}s")
+
+    print("\nAll tests passed!")
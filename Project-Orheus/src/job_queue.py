@@ -0,0 +1,313 @@
+"""
+Job Store and Queue
+Keeps generation job records and hands queued jobs to workers.
+
+Three backends share one interface:
+    memory              - in-process dict (single server, the default)
+    sqlite:///path.db   - SQLite file on a local disk (several processes, one host)
+    redis://host:port/0 - any Redis-protocol server (Redis, Valkey, KeyDB)
+
+API nodes create and enqueue jobs; worker nodes claim them, run the
+generation and write progress and results back through update(). Small
+values every node needs (e.g. generation timings) go through set_meta().
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+class JobStore:
+    """In-memory job records and queue (single process)."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._meta = {}
+        self._queue: "queue.Queue[Tuple[str, dict]]" = queue.Queue()
+        self._lock = threading.Lock()
+
+    def create(self, job_id: str, record: dict) -> None:
+        """Store a new job record."""
+        with self._lock:
+            self._jobs[job_id] = dict(record)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Return a copy of the job record, or None if unknown."""
+        with self._lock:
+            record = self._jobs.get(job_id)
+            return dict(record) if record is not None else None
+
+    def update(self, job_id: str, fields: dict) -> None:
+        """Merge top-level fields into a job record."""
+        with self._lock:
+            self._jobs.setdefault(job_id, {}).update(fields)
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+    def enqueue(self, job_id: str, payload: dict) -> None:
+        """Mark a job as queued and make it available to claim()."""
+        self.update(job_id, {"status": "queued"})
+        self._queue.put((job_id, payload))
+
+    def claim(self, worker_id: str, timeout: float = 5.0) -> Optional[Tuple[str, dict]]:
+        """
+        Take the oldest queued job, marking it as processing.
+
+        Returns:
+            (job_id, payload), or None if nothing was queued within timeout
+        """
+        try:
+            job_id, payload = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        self.update(job_id, {"status": "processing", "worker": worker_id})
+        return job_id, payload
+
+    def set_meta(self, name: str, value) -> None:
+        """Store a JSON-serializable value shared by every node (not a job)."""
+        with self._lock:
+            self._meta[name] = json.loads(json.dumps(value))
+
+    def get_meta(self, name: str):
+        """Return a value stored with set_meta(), or None."""
+        with self._lock:
+            value = self._meta.get(name)
+            return json.loads(json.dumps(value)) if value is not None else None
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Job records and queue in a SQLite database.
+
+    For API and worker processes on one host: the file must be on a local
+    disk. WAL mode keeps its shared-memory index in host memory, so nodes on
+    other hosts reading the same file over a network filesystem can see
+    stale data or corrupt it; use Redis across hosts.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.5):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                record TEXT NOT NULL,
+                payload TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, created)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread, in autocommit mode (transactions are explicit)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def create(self, job_id: str, record: dict) -> None:
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (job_id, status, record, created, updated) VALUES (?, ?, ?, ?, ?)",
+            (job_id, record.get("status", ""), json.dumps(record), now, now),
+        )
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._conn().execute("SELECT record FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, job_id: str, fields: dict) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT record FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            record = json.loads(row[0]) if row else {}
+            record.update(fields)
+            now = time.time()
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, record, created, updated) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET status = excluded.status, "
+                "record = excluded.record, updated = excluded.updated",
+                (job_id, record.get("status", ""), json.dumps(record), now, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def enqueue(self, job_id: str, payload: dict) -> None:
+        # Status and payload change together, so a worker never sees a
+        # queued row without its payload
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT record FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            record = json.loads(row[0]) if row else {}
+            record["status"] = "queued"
+            now = time.time()
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, record, payload, created, updated) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(job_id) DO UPDATE SET status = excluded.status, "
+                "record = excluded.record, payload = excluded.payload, updated = excluded.updated",
+                (job_id, "queued", json.dumps(record), json.dumps(payload), now, now),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def claim(self, worker_id: str, timeout: float = 5.0) -> Optional[Tuple[str, dict]]:
+        deadline = time.monotonic() + timeout
+        conn = self._conn()
+
+        while True:
+            # BEGIN IMMEDIATE takes the write lock, so two workers never claim the same row
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT job_id, record, payload FROM jobs "
+                    "WHERE status = 'queued' AND payload IS NOT NULL "
+                    "ORDER BY created LIMIT 1"
+                ).fetchone()
+                if row:
+                    job_id, record, payload = row
+                    record = json.loads(record)
+                    record.update({"status": "processing", "worker": worker_id})
+                    conn.execute(
+                        "UPDATE jobs SET status = 'processing', record = ?, updated = ? WHERE job_id = ?",
+                        (json.dumps(record), time.time(), job_id),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            if row:
+                return job_id, json.loads(payload)
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def set_meta(self, name: str, value) -> None:
+        self._conn().execute(
+            "INSERT INTO meta (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, json.dumps(value)),
+        )
+
+    def get_meta(self, name: str):
+        row = self._conn().execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+class RedisJobStore(JobStore):
+    """
+    Job records and queue on a Redis-protocol server.
+
+    Each job is a hash of JSON-encoded top-level fields, so update() is a
+    single atomic HSET; the queue is a list consumed with BRPOP.
+    """
+
+    def __init__(self, url: str, prefix: str = "orpheus"):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("RedisJobStore requires the 'redis' package (pip install redis)") from e
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.queue_key = f"{prefix}:queue"
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    def create(self, job_id: str, record: dict) -> None:
+        self.update(job_id, record)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        fields = self.client.hgetall(self._key(job_id))
+        if not fields:
+            return None
+        return {key.decode(): json.loads(value) for key, value in fields.items()}
+
+    def update(self, job_id: str, fields: dict) -> None:
+        if fields:
+            self.client.hset(self._key(job_id), mapping={k: json.dumps(v) for k, v in fields.items()})
+
+    def enqueue(self, job_id: str, payload: dict) -> None:
+        pipe = self.client.pipeline()
+        pipe.hset(self._key(job_id), mapping={"status": json.dumps("queued"), "payload": json.dumps(payload)})
+        pipe.lpush(self.queue_key, job_id)
+        pipe.execute()
+
+    def claim(self, worker_id: str, timeout: float = 5.0) -> Optional[Tuple[str, dict]]:
+        item = self.client.brpop(self.queue_key, timeout=max(1, int(timeout)))
+        if item is None:
+            return None
+        job_id = item[1].decode()
+        payload = json.loads(self.client.hget(self._key(job_id), "payload"))
+        self.update(job_id, {"status": "processing", "worker": worker_id})
+        return job_id, payload
+
+    def set_meta(self, name: str, value) -> None:
+        self.client.set(f"{self.prefix}:meta:{name}", json.dumps(value))
+
+    def get_meta(self, name: str):
+        value = self.client.get(f"{self.prefix}:meta:{name}")
+        return json.loads(value) if value is not None else None
+
+
+def create_job_store(url: str = "memory") -> JobStore:
+    """
+    Build a job store from a URL: "memory", "sqlite:///path.db" or "redis://...".
+    """
+    if url == "memory":
+        return JobStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteJobStore(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisJobStore(url)
+    raise ValueError(f"Unsupported job store URL: {url}")
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+
+    # Test the SQLite store with two competing workers
+    path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+    store = create_job_store(f"sqlite:///{path}")
+
+    for i in range(4):
+        store.create(f"job-{i}", {"status": "pending"})
+        store.enqueue(f"job-{i}", {"prompt": f"prompt {i}"})
+
+    claimed = []
+    def work(name):
+        while True:
+            item = store.claim(name, timeout=0.2)
+            if item is None:
+                return
+            claimed.append(item[0])
+            store.update(item[0], {"status": "completed"})
+
+    threads = [threading.Thread(target=work, args=(f"worker-{n}",)) for n in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f"Claimed: {sorted(claimed)}")
+    print(f"job-0: {store.get('job-0')}")
+    print("\nAll tests passed!")
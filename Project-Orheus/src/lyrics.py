@@ -1,5 +1,181 @@
+import os
 import re
-from typing import List, Dict, Tuple
+import threading
+import numpy as np
+from typing import List, Dict, Optional, Tuple
+
+from cache import LRUCache
+
+# Default lyric template corpus (mood<TAB>section<TAB>line)
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "data", "lyric_templates.tsv")
+
+# Placeholder line used for sections without lyrics
+INSTRUMENTAL = "[Instrumental]"
+
+# Line separator used by LyricGenerator.format_for_musicgen
+LINE_SEPARATOR = "/"
+
+_VOWELS = np.array([ord(c) for c in "aeiouy"], dtype=np.uint32)
+_SPACE = ord(" ")
+_E = ord("e")
+_L = ord("l")
+
+
+def timing_dtype(max_word_length: int) -> np.dtype:
+    """Structured dtype for aligned word timings."""
+    return np.dtype([
+        ("start", np.float32),
+        ("end", np.float32),
+        ("word", f"U{max(1, max_word_length)}"),
+        ("syllables", np.int16),
+        ("beat", np.int32),
+        ("section", np.int16),
+        ("song", np.int32),
+    ])
+
+
+def count_syllables(words: List[str]) -> np.ndarray:
+    """
+    Estimate syllables per word from vowel groups, for all words at once.
+    
+    The words are joined into one code-point array; a syllable starts at
+    every vowel that follows a non-vowel, with a silent trailing "e"
+    discounted (but not "-le", as in "little"). Every word counts at least 1.
+    """
+    if not words:
+        return np.zeros(0, dtype=np.int64)
+    
+    text = " ".join(words).lower()
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    
+    is_vowel = np.isin(codes, _VOWELS)
+    group_start = is_vowel.copy()
+    group_start[1:] &= ~is_vowel[:-1]
+    
+    # Word id of every character (spaces belong to the following word)
+    is_space = codes == _SPACE
+    word_id = np.cumsum(is_space)
+    counts = np.bincount(word_id[group_start], minlength=len(words))
+    
+    # Silent final "e": last char of the word is "e" preceded by a consonant other than "l"
+    word_end = np.flatnonzero(np.append(is_space[1:], True))
+    prev = np.maximum(word_end - 1, 0)
+    silent_e = (
+        (codes[word_end] == _E)
+        & ~is_vowel[prev]
+        & (codes[prev] != _L)
+        & ~is_space[prev]
+        & (counts > 1)
+    )
+    counts -= silent_e
+    
+    return np.maximum(counts, 1)
+
+class LyricTemplateStore:
+    """
+    Indexed, read-only store of lyric template lines.
+    
+    Lines are loaded once from a TSV corpus (mood, section, line) into one
+    packed string plus offset and id arrays, indexed by (mood, section) and
+    by syllable count. Stores are shared per corpus path, so creating more
+    LyricGenerator instances costs nothing.
+    """
+    
+    _shared: Dict[str, "LyricTemplateStore"] = {}
+    _shared_lock = threading.Lock()
+    
+    def __init__(self, path: str):
+        self.path = path
+        rows = []
+        with open(path, encoding="utf-8") as f:
+            for line_number, raw in enumerate(f, 1):
+                raw = raw.rstrip("\n")
+                if not raw.strip() or raw.startswith("#"):
+                    continue
+                if raw.count("\t") < 2:
+                    raise ValueError(f"{path}:{line_number}: expected mood<TAB>section<TAB>line, got {raw!r}")
+                mood, section, line = raw.split("\t", 2)
+                rows.append((mood.strip().lower(), section.strip().lower(), line.strip()))
+        
+        self.moods = sorted({mood for mood, _, _ in rows})
+        self.sections = sorted({section for _, section, _ in rows})
+        mood_ids = {m: i for i, m in enumerate(self.moods)}
+        section_ids = {s: i for i, s in enumerate(self.sections)}
+        
+        # All line text packed into one string; line i is _text[_offsets[i]:_offsets[i + 1]]
+        lines = [line for _, _, line in rows]
+        self._text = "".join(lines)
+        self._offsets = np.zeros(len(lines) + 1, dtype=np.int64)
+        np.cumsum([len(line) for line in lines], out=self._offsets[1:])
+        
+        self.mood_id = np.array([mood_ids[m] for m, _, _ in rows], dtype=np.int16)
+        self.section_id = np.array([section_ids[s] for _, s, _ in rows], dtype=np.int16)
+        
+        # Syllables per line, counted for the whole corpus in one call
+        words_per_line = [line.split() for line in lines]
+        word_line = np.repeat(np.arange(len(lines)), [len(w) for w in words_per_line])
+        word_syllables = count_syllables([w for words in words_per_line for w in words])
+        self.syllables = np.bincount(word_line, weights=word_syllables, minlength=len(lines)).astype(np.int16)
+        
+        # (mood, section) -> line indices in file order, and the same indices
+        # sorted by syllable count (ties in file order) with their counts
+        order = np.lexsort((np.arange(len(lines)), self.section_id, self.mood_id))
+        keys = self.mood_id[order].astype(np.int64) * len(self.sections) + self.section_id[order]
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+        self._index: Dict[Tuple[str, str], np.ndarray] = {}
+        self._by_syllables: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]] = {}
+        for group in np.split(order, bounds) if len(order) else []:
+            first = group[0]
+            key = (self.moods[self.mood_id[first]], self.sections[self.section_id[first]])
+            self._index[key] = group
+            by_syllables = group[np.argsort(self.syllables[group], kind="stable")]
+            self._by_syllables[key] = (by_syllables, self.syllables[by_syllables])
+        
+        # Memoized formatted conditioning strings per (mood, section kinds)
+        self.formatted = LRUCache(maxsize=1024)
+    
+    @classmethod
+    def shared(cls, path: str) -> "LyricTemplateStore":
+        """Return the process-wide store for a corpus file, loading it on first use."""
+        path = os.path.abspath(path)
+        with cls._shared_lock:
+            if path not in cls._shared:
+                cls._shared[path] = cls(path)
+            return cls._shared[path]
+    
+    def line(self, index: int) -> str:
+        """Text of a single line."""
+        return self._text[self._offsets[index]:self._offsets[index + 1]]
+    
+    def lines(self, mood: str, section: str,
+              limit: Optional[int] = None,
+              max_syllables: Optional[int] = None) -> List[str]:
+        """
+        Lines for a mood and section, in corpus order.
+        
+        Args:
+            mood: Mood name
+            section: Section kind ("verse", "chorus", ...)
+            limit: Maximum number of lines to return
+            max_syllables: Only return lines with at most this many syllables
+        """
+        indices = self._index.get((mood, section))
+        if indices is None:
+            return []
+        if max_syllables is not None:
+            # Binary search the syllable-sorted group, then restore file order
+            by_syllables, counts = self._by_syllables[(mood, section)]
+            indices = np.sort(by_syllables[:np.searchsorted(counts, max_syllables, side="right")])
+        if limit is not None:
+            indices = indices[:limit]
+        return [self.line(i) for i in indices]
+    
+    def has_mood(self, mood: str) -> bool:
+        return mood in self.moods
+    
+    def __len__(self) -> int:
+        return len(self.mood_id)
+
 
 class LyricGenerator:
     """
@@ -7,51 +183,25 @@ class LyricGenerator:
     Currently template-based; will be replaced with LLM in Phase 2.
     """
     
-    def __init__(self):
-        self.templates = {
-            "happy": {
-                "verse": [
-                    "Dancing through the day",
-                    "Sunshine lights the way",
-                    "Feeling so alive",
-                    "Good vibes never die"
-                ],
-                "chorus": [
-                    "We're flying high tonight",
-                    "Everything feels right",
-                    "Hearts are shining bright",
-                    "Living in the light"
-                ]
-            },
-            "sad": {
-                "verse": [
-                    "Walking in the rain",
-                    "Feeling all the pain",
-                    "Memories remain",
-                    "Nothing stays the same"
-                ],
-                "chorus": [
-                    "Missing you tonight",
-                    "Fading from my sight",
-                    "Lost without your light",
-                    "Can't make this right"
-                ]
-            },
-            "energetic": {
-                "verse": [
-                    "Feel the rhythm rise",
-                    "Fire in our eyes",
-                    "Ready for the night",
-                    "Gonna reach new heights"
-                ],
-                "chorus": [
-                    "Turn it up, let's go",
-                    "Feel the energy flow",
-                    "We're unstoppable",
-                    "Watch us steal the show"
-                ]
-            }
-        }
+    def __init__(self, corpus_path: Optional[str] = None, lines_per_section: int = 4):
+        self.store = LyricTemplateStore.shared(corpus_path or DEFAULT_CORPUS)
+        self.lines_per_section = lines_per_section
+    
+    def _section_kind(self, section: str) -> Optional[str]:
+        """Map a section name to the template section it uses (None = instrumental)."""
+        section_lower = section.lower()
+        if "verse" in section_lower:
+            return "verse"
+        elif "chorus" in section_lower:
+            return "chorus"
+        # Intro/Outro typically instrumental
+        return None
+    
+    def _resolve_mood(self, mood: str) -> str:
+        mood = mood.lower()
+        if not self.store.has_mood(mood):
+            mood = "happy"  # Default fallback
+        return mood
     
     def generate(self, mood: str, structure: List[str]) -> Dict[str, List[str]]:
         """
@@ -60,22 +210,15 @@ class LyricGenerator:
         Returns:
             Dict mapping section name to list of lyric lines
         """
-        mood = mood.lower()
-        if mood not in self.templates:
-            mood = "happy"  # Default fallback
-            
-        template = self.templates[mood]
+        mood = self._resolve_mood(mood)
         lyrics = {}
         
         for section in structure:
-            section_lower = section.lower()
-            if "verse" in section_lower:
-                lyrics[section] = template["verse"]
-            elif "chorus" in section_lower:
-                lyrics[section] = template["chorus"]
+            kind = self._section_kind(section)
+            if kind is None:
+                lyrics[section] = [INSTRUMENTAL]
             else:
-                # Intro/Outro typically instrumental
-                lyrics[section] = ["[Instrumental]"]
+                lyrics[section] = self.store.lines(mood, kind, limit=self.lines_per_section)
                 
         return lyrics
     
@@ -85,21 +228,169 @@ class LyricGenerator:
         """
         all_lines = []
         for section, lines in lyrics_dict.items():
-            if lines != ["[Instrumental]"]:
+            if lines != [INSTRUMENTAL]:
                 all_lines.extend(lines)
         
         return " / ".join(all_lines)
+    
+    def format_for_mood(self, mood: str, structure: List[str]) -> str:
+        """
+        Memoized equivalent of format_for_musicgen(generate(mood, structure)).
+        
+        The result only depends on the mood and the distinct section names,
+        so repeated requests reuse the joined string from the shared store.
+        """
+        mood = self._resolve_mood(mood)
+        # generate() keys by section name, so later repeats collapse onto the first
+        sections = tuple(dict.fromkeys(structure))
+        key = (mood, sections, self.lines_per_section)
+        return self.store.formatted.get_or_compute(
+            key, lambda: self.format_for_musicgen(self.generate(mood, list(sections)))
+        )
 
 
 class LyricAligner:
     """
-    Simulates phoneme-level alignment for future implementation.
-    In production, this would use Montreal Forced Aligner or similar.
+    Estimates word timings on a tempo grid.
+    
+    Syllable counts, beat snapping and section boundaries are all computed
+    with NumPy over flat word arrays, so one song and a whole catalog go
+    through the same vectorized path. In production, this would use
+    Montreal Forced Aligner or similar.
     """
     
     def __init__(self):
         pass
     
+    def align(self, lyrics, duration_sec: float, bpm: int,
+              structure: Optional[List[str]] = None) -> np.ndarray:
+        """
+        Estimate beat-snapped timing for each word of one song.
+        
+        Args:
+            lyrics: Lyric text, or a section -> lines dict from LyricGenerator.generate
+            duration_sec: Total song duration in seconds
+            bpm: Beats per minute (defines the snapping grid)
+            structure: Section order for a lyrics dict (repeated sections reuse
+                their lines); defaults to the dict's own order
+        
+        Returns:
+            Structured array with fields start, end, word, syllables, beat,
+            section and song (see timing_dtype())
+        """
+        return self.align_batch([{
+            "lyrics": lyrics,
+            "duration_sec": duration_sec,
+            "bpm": bpm,
+            "structure": structure,
+        }])
+    
+    def align_batch(self, songs: List[dict]) -> np.ndarray:
+        """
+        Align many songs at once.
+        
+        Args:
+            songs: Dicts with keys lyrics, duration_sec, bpm and optional structure
+        
+        Returns:
+            One structured array for all songs; the song field holds each
+            word's index into songs
+        """
+        # Flatten songs -> sections -> words (tokenizing is the only per-song work)
+        words: List[str] = []
+        words_per_section = []
+        section_song = []
+        section_index = []
+        for song_id, song in enumerate(songs):
+            for k, section_words in enumerate(self._section_words(song["lyrics"], song.get("structure"))):
+                words.extend(section_words)
+                words_per_section.append(len(section_words))
+                section_song.append(song_id)
+                section_index.append(k)
+        
+        if not words:
+            return np.zeros(0, dtype=timing_dtype(1))
+        
+        words_per_section = np.array(words_per_section, dtype=np.int64)
+        section_song = np.array(section_song, dtype=np.int64)
+        section_index = np.array(section_index, dtype=np.int64)
+        num_sections = len(words_per_section)
+        
+        # Per-song tempo grid and section layout
+        durations = np.array([song["duration_sec"] for song in songs], dtype=np.float64)
+        beat_sec = 60.0 / np.array([song["bpm"] for song in songs], dtype=np.float64)
+        sections_in_song = np.bincount(section_song, minlength=len(songs))
+        total_beats = np.maximum(np.floor(durations / beat_sec), sections_in_song)
+        
+        # Sections split each song's beats evenly, on whole-beat boundaries
+        song_beats = total_beats[section_song]
+        song_sections = sections_in_song[section_song]
+        section_start = np.round(section_index * song_beats / song_sections)
+        section_end = np.round((section_index + 1) * song_beats / song_sections)
+        section_beats = np.maximum(section_end - section_start, 1)
+        
+        # Subdivide the beat (1, 2, 4, ...) where a section has more words than beats
+        density = np.maximum(words_per_section / section_beats, 1.0)
+        subdivision = 2.0 ** np.ceil(np.log2(density))
+        slots = section_beats * subdivision
+        
+        # Word -> section lookup and each word's rank within its section
+        word_section = np.repeat(np.arange(num_sections), words_per_section)
+        first_word = np.cumsum(words_per_section) - words_per_section
+        rank = np.arange(len(words)) - first_word[word_section]
+        
+        # Onsets proportional to the syllables sung before each word
+        syllables = count_syllables(words)
+        syllables_before = np.cumsum(syllables) - syllables
+        syllables_before -= syllables_before[first_word[word_section]]
+        section_syllables = np.bincount(word_section, weights=syllables, minlength=num_sections)
+        fraction = syllables_before / section_syllables[word_section]
+        
+        slot = np.round(fraction * slots[word_section])
+        
+        # Force one slot per word: a running max of (slot - rank), segmented
+        # per section by a large per-section offset, keeps onsets strictly
+        # increasing; the upper bound leaves room for the words that follow.
+        offset = word_section * (slots.max() + len(words) + 1)
+        slot = np.maximum.accumulate(slot - rank + offset) - offset + rank
+        slot = np.minimum(slot, slots[word_section] - words_per_section[word_section] + rank)
+        
+        onset_beat = section_start[word_section] + slot / subdivision[word_section]
+        word_beat_sec = beat_sec[section_song[word_section]]
+        start = onset_beat * word_beat_sec
+        
+        # Each word lasts until the next onset, or the end of its section
+        end = np.empty_like(start)
+        end[:-1] = start[1:]
+        last_word = first_word + words_per_section - 1
+        has_words = words_per_section > 0
+        end[last_word[has_words]] = section_end[has_words] * beat_sec[section_song[has_words]]
+        
+        timings = np.empty(len(words), dtype=timing_dtype(max(map(len, words))))
+        timings["start"] = start
+        timings["end"] = end
+        timings["word"] = words
+        timings["syllables"] = syllables
+        timings["beat"] = np.floor(onset_beat)
+        timings["section"] = section_index[word_section]
+        timings["song"] = section_song[word_section]
+        
+        return timings
+    
+    def _section_words(self, lyrics, structure: Optional[List[str]]) -> List[List[str]]:
+        """Split lyrics into per-section word lists (instrumental sections are empty)."""
+        if isinstance(lyrics, str):
+            return [[w for w in lyrics.split() if w != LINE_SEPARATOR]]
+        
+        order = structure if structure is not None else list(lyrics)
+        sections = []
+        for name in order:
+            lines = lyrics.get(name, [])
+            if lines == [INSTRUMENTAL]:
+                lines = []
+            sections.append(" ".join(lines).split())
+        return sections
+    
     def estimate_timings(self, lyrics: str, duration_sec: float, bpm: int) -> List[Tuple[float, float, str]]:
         """
         Estimate rough timing for each word in lyrics.
@@ -112,24 +403,8 @@ class LyricAligner:
         Returns:
             List of (start_time, end_time, word) tuples
         """
-        words = lyrics.split()
-        if not words:
-            return []
-        
-        # Simple uniform distribution
-        # In reality, this would use phoneme duration models
-        time_per_word = duration_sec / len(words)
-        
-        timings = []
-        current_time = 0.0
-        
-        for word in words:
-            start = current_time
-            end = current_time + time_per_word
-            timings.append((start, end, word))
-            current_time = end
-            
-        return timings
+        timings = self.align(lyrics, duration_sec, bpm)
+        return list(zip(timings["start"].tolist(), timings["end"].tolist(), timings["word"].tolist()))
     
     def generate_alignment_prompt(self, lyrics: str, structure: List[str]) -> str:
         """
@@ -165,3 +440,10 @@ if __name__ == "__main__":
     print(f"\nEstimated Word Timings (first 5):")
     for start, end, word in timings[:5]:
         print(f"  {start:.2f}s - {end:.2f}s: {word}")
+    
+    print("\n" + "=" * 50)
+    aligned = aligner.align(lyrics, duration_sec=60, bpm=80, structure=structure)
+    print(f"\nSection-aware alignment (first 5 of {len(aligned)} words):")
+    for row in aligned[:5]:
+        print(f"  [{structure[row['section']]}] beat {row['beat']}: {row['start']:.2f}s - {row['end']:.2f}s "
+              f"{row['word']} ({row['syllables']} syl)")
@@ -1,22 +1,215 @@
 import re
 import json
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from cache import LRUCache
+
+# Default taxonomy: category -> canonical term -> phrases that map to it.
+# The canonical term itself always matches; list extra synonyms only.
+DEFAULT_TAXONOMY = {
+    "genre": {
+        "rock": [],
+        "pop": [],
+        "jazz": [],
+        "classical": [],
+        "edm": ["electronic dance", "electronic dance music"],
+        "hip hop": ["hiphop"],
+        "rap": [],
+        "metal": ["heavy metal"],
+        "country": [],
+        "blues": [],
+    },
+    "mood": {
+        "happy": ["joyful", "cheerful"],
+        "sad": ["melancholic", "melancholy"],
+        "energetic": ["high energy"],
+        "relaxed": ["relaxing", "chill", "calm"],
+        "dark": [],
+        "romantic": [],
+        "angry": [],
+        "uplifting": [],
+    },
+    "instrument": {
+        "piano": [],
+        "acoustic guitar": [],
+        "electric guitar": [],
+        "guitar": [],
+        "bass": ["bass guitar"],
+        "drums": ["drum kit"],
+        "drum machine": [],
+        "synth": ["synthesizer", "synths"],
+        "strings": [],
+        "violin": [],
+        "cello": [],
+        "brass": [],
+        "trumpet": [],
+        "saxophone": ["sax"],
+        "flute": [],
+        "organ": [],
+    },
+}
+
+# Words inside a phrase may be separated by spaces, tabs or hyphens ("hip-hop")
+_SEPARATOR = r"[ \t\-]+"
+_SEPARATOR_RE = re.compile(_SEPARATOR)
+
+
+class KeywordMatcher:
+    """
+    Finds vocabulary phrases in text in a single pass.
+
+    All phrases are compiled into one regex whose alternation is laid out as
+    a character trie, so matching cost grows with the text length rather than
+    the vocabulary size. Matches respect word boundaries and always prefer
+    the longest phrase ("acoustic guitar" over "guitar").
+    """
+
+    def __init__(self, taxonomy: Dict[str, Dict[str, List[str]]]):
+        # Normalized phrase -> (category, canonical term)
+        self.lookup: Dict[str, Tuple[str, str]] = {}
+
+        for category, terms in taxonomy.items():
+            for canonical, synonyms in terms.items():
+                for phrase in [canonical, *synonyms]:
+                    self.lookup.setdefault(self._normalize(phrase), (category, canonical))
+
+        trie: dict = {}
+        for phrase in self.lookup:
+            node = trie
+            for char in phrase:
+                node = node.setdefault(char, {})
+            node[""] = True  # end-of-phrase marker
+
+        self.pattern = re.compile(r"\b" + self._trie_to_regex(trie) + r"\b")
+
+    def _normalize(self, phrase: str) -> str:
+        """Lowercase and collapse separators to single spaces."""
+        return _SEPARATOR_RE.sub(" ", phrase.strip().lower())
+
+    def _trie_to_regex(self, node: dict) -> str:
+        """Convert a character trie into an equivalent regex fragment."""
+        alternatives = []
+        optional = False
+
+        for char in sorted(node):
+            if char == "":
+                optional = True
+                continue
+            token = _SEPARATOR if char == " " else re.escape(char)
+            alternatives.append(token + self._trie_to_regex(node[char]))
+
+        if not alternatives:
+            return ""
+
+        if len(alternatives) == 1 and not optional:
+            return alternatives[0]
+
+        pattern = "(?:" + "|".join(alternatives) + ")"
+        return pattern + "?" if optional else pattern
+
+    def find_all(self, text: str) -> List[Tuple[int, str, str]]:
+        """
+        Find every vocabulary match in lowercase text.
+
+        Returns:
+            List of (start_offset, category, canonical_term) in text order
+        """
+        return [
+            (m.start(), *self.lookup[self._normalize(m.group(0))])
+            for m in self.pattern.finditer(text)
+        ]
+
 
 class MusicPlanner:
     """
     Parses natural language prompts into structured musical metadata.
     Currently uses rule-based extraction (placeholder for LLM).
     """
-    
-    def __init__(self):
-        self.genres = ["rock", "pop", "jazz", "classical", "edm", "hip hop", "rap", "metal", "country", "blues"]
-        self.moods = ["happy", "sad", "energetic", "relaxed", "dark", "romantic", "angry", "uplifting"]
-        
+
+    def __init__(self, taxonomy: Optional[Dict[str, Dict[str, List[str]]]] = None,
+                 cache_size: int = 4096):
+        self.taxonomy = taxonomy or DEFAULT_TAXONOMY
+        self.genres = list(self.taxonomy.get("genre", {}))
+        self.moods = list(self.taxonomy.get("mood", {}))
+        self.instruments = list(self.taxonomy.get("instrument", {}))
+
+        # Compile the whole vocabulary once; plan() is then one scan per prompt
+        self.matcher = KeywordMatcher(self.taxonomy)
+        self.bpm_pattern = re.compile(r'(\d+)\s*bpm')
+
+        # Normalized prompt -> (matched terms, bpm). Only the analysis is
+        # cached; each call still gets a fresh plan dict with its own prompt.
+        self.plan_cache = LRUCache(maxsize=cache_size)
+
+    def _normalize_prompt(self, prompt: str) -> str:
+        """Cache key for a prompt: lowercase with whitespace collapsed."""
+        return " ".join(prompt.lower().split())
+
+    def _analyze(self, key: str) -> Tuple[tuple, Optional[int]]:
+        """Scan a normalized prompt for vocabulary terms and a BPM."""
+        matches = tuple((category, term) for _, category, term in self.matcher.find_all(key))
+        bpm_match = self.bpm_pattern.search(key)
+        return matches, int(bpm_match.group(1)) if bpm_match else None
+
     def plan(self, prompt: str) -> dict:
         """
         Analyze the prompt and return a structured plan.
         """
-        prompt_lower = prompt.lower()
-        
+        key = self._normalize_prompt(prompt)
+        matches, bpm = self.plan_cache.get_or_compute(key, lambda: self._analyze(key))
+
+        return self._build_plan(prompt, matches, bpm)
+
+    def plan_many(self, prompts: List[str]) -> List[dict]:
+        """
+        Plan a batch of prompts with a single scan over all uncached ones.
+
+        The prompts are joined with newlines (which no phrase can span) and
+        matched in one pass; matches are mapped back to their prompt by offset.
+        """
+        keys = [self._normalize_prompt(p) for p in prompts]
+        analyses = {}
+        for key in keys:
+            cached = self.plan_cache.get(key)
+            if cached is not None:
+                analyses[key] = cached
+
+        # Unique cache misses, in first-seen order
+        pending = list(dict.fromkeys(k for k in keys if k not in analyses))
+        if pending:
+            for key, analysis in zip(pending, self._analyze_many(pending)):
+                self.plan_cache.put(key, analysis)
+                analyses[key] = analysis
+
+        return [self._build_plan(p, *analyses[k]) for p, k in zip(prompts, keys)]
+
+    def _analyze_many(self, keys: List[str]) -> List[Tuple[tuple, Optional[int]]]:
+        """Batch version of _analyze: one regex scan over all keys."""
+        starts = []
+        offset = 0
+        for text in keys:
+            starts.append(offset)
+            offset += len(text) + 1
+        joined = "\n".join(keys)
+
+        matches: List[list] = [[] for _ in keys]
+        for start, category, term in self.matcher.find_all(joined):
+            matches[bisect_right(starts, start) - 1].append((category, term))
+
+        bpms: List[Optional[int]] = [None] * len(keys)
+        for m in self.bpm_pattern.finditer(joined):
+            index = bisect_right(starts, m.start()) - 1
+            # Ignore a number and "bpm" that only line up across two prompts
+            if bisect_right(starts, m.end() - 1) - 1 != index:
+                continue
+            if bpms[index] is None:
+                bpms[index] = int(m.group(1))
+
+        return [(tuple(ms), bpm) for ms, bpm in zip(matches, bpms)]
+
+    def _build_plan(self, prompt: str, matches: tuple, bpm: Optional[int]) -> dict:
+        """Assemble a plan dict from keyword matches and an optional BPM."""
         # Default values
         plan = {
             "original_prompt": prompt,
@@ -28,32 +221,32 @@ class MusicPlanner:
             "structure": ["Intro", "Verse", "Chorus", "Outro"],
             "description": prompt # Passed to the model
         }
-        
+
         # Extract BPM
-        bpm_match = re.search(r'(\d+)\s*bpm', prompt_lower)
-        if bpm_match:
-            plan["bpm"] = int(bpm_match.group(1))
-            
-        # Extract Genre
-        for g in self.genres:
-            if g in prompt_lower:
-                plan["genre"] = g
-                break
-                
-        # Extract Mood
-        for m in self.moods:
-            if m in prompt_lower:
-                plan["mood"] = m
-                break
-                
+        if bpm is not None:
+            plan["bpm"] = bpm
+
+        # First genre and mood mentioned win; instruments are collected in order
+        found = {"genre": None, "mood": None}
+        for category, term in matches:
+            if category in found and found[category] is None:
+                found[category] = term
+            elif category == "instrument" and term not in plan["instruments"]:
+                plan["instruments"].append(term)
+
+        if found["genre"]:
+            plan["genre"] = found["genre"]
+        if found["mood"]:
+            plan["mood"] = found["mood"]
+
         # Construct a refined description for the model
         # MusicGen works best with comma-separated tags
         tags = [plan["genre"], plan["mood"]]
-        if bpm_match:
+        if bpm is not None:
             tags.append(f"{plan['bpm']} bpm")
-            
+
         plan["description"] = ", ".join(tags) + ", " + prompt
-        
+
         return plan
 
 if __name__ == "__main__":
@@ -61,3 +254,7 @@ if __name__ == "__main__":
     planner = MusicPlanner()
     test_prompt = "A sad jazz song at 80 bpm about rain"
     print(json.dumps(planner.plan(test_prompt), indent=2))
+
+    # Batch planning
+    for plan in planner.plan_many(["Chill hip-hop with piano", "grape-flavoured metal at 160 bpm"]):
+        print(plan["genre"], plan["mood"], plan["instruments"], plan["bpm"])
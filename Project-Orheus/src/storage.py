@@ -0,0 +1,191 @@
+"""
+Output Storage Management
+Lays out generated files in sharded directories and keeps disk usage
+bounded with age and size quotas enforced by a background garbage collector.
+"""
+
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# Job files are named "<uuid><suffix>", e.g. "<uuid>.wav", "<uuid>.peaks.json"
+_JOB_FILE = re.compile(r"^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})\.")
+
+class OutputStorage:
+    """
+    Sharded output directory with quota-aware garbage collection.
+
+    Files for a job live in ``root/<first two chars of job id>/`` so no
+    single directory grows without bound. Every file belonging to a job is
+    evicted together. Last access is tracked through the files' atime,
+    which touch() sets explicitly on download, so it works across nodes
+    sharing the directory and regardless of noatime mounts.
+    """
+
+    def __init__(self, root: Path,
+                 max_bytes: Optional[int] = None,
+                 max_age_sec: Optional[float] = None,
+                 gc_interval: float = 300.0,
+                 min_age_sec: float = 600.0,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            root: Output directory
+            max_bytes: Evict least recently downloaded jobs above this total size
+            max_age_sec: Evict jobs created longer ago than this
+            gc_interval: Seconds between background collections
+            min_age_sec: Never evict jobs younger than this (they may still be written)
+            on_evict: Called with each evicted job id
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age_sec = max_age_sec
+        self.gc_interval = gc_interval
+        self.min_age_sec = min_age_sec
+        self.on_evict = on_evict
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def shard_dir(self, job_id: str) -> Path:
+        return self.root / job_id[:2]
+
+    def path_for(self, job_id: str, suffix: str) -> Path:
+        """
+        Path for one of a job's files (e.g. suffix ".wav"), creating its shard.
+        """
+        shard = self.shard_dir(job_id)
+        shard.mkdir(exist_ok=True)
+        return shard / f"{job_id}{suffix}"
+
+    def job_files(self, job_id: str) -> List[Path]:
+        """All files stored for a job."""
+        shard = self.shard_dir(job_id)
+        if not shard.is_dir():
+            return []
+        return [shard / name for name in os.listdir(shard) if name.startswith(job_id + ".")]
+
+    def touch(self, job_id: str) -> None:
+        """Record an access (download) of a job's files."""
+        now = time.time()
+        for path in self.job_files(job_id):
+            try:
+                os.utime(path, (now, path.stat().st_mtime))
+            except FileNotFoundError:
+                pass
+
+    def _scan(self) -> Dict[str, dict]:
+        """
+        Group every job file under root by job id.
+
+        Returns:
+            job_id -> {"paths", "bytes", "created", "accessed"}
+        """
+        groups: Dict[str, dict] = {}
+
+        # Shard directories, plus files written flat into root by older versions
+        directories = [self.root] + [Path(e.path) for e in os.scandir(self.root) if e.is_dir()]
+        for directory in directories:
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                match = _JOB_FILE.match(entry.name)
+                if not match or not entry.is_file():
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                group = groups.setdefault(match.group(1), {
+                    "paths": [], "bytes": 0, "created": st.st_mtime, "accessed": st.st_atime
+                })
+                group["paths"].append(entry.path)
+                group["bytes"] += st.st_size
+                group["created"] = min(group["created"], st.st_mtime)
+                group["accessed"] = max(group["accessed"], st.st_atime, st.st_mtime)
+
+        return groups
+
+    def usage(self) -> dict:
+        """Current number of jobs and total bytes on disk."""
+        groups = self._scan()
+        return {
+            "jobs": len(groups),
+            "bytes": sum(g["bytes"] for g in groups.values()),
+            "max_bytes": self.max_bytes,
+            "max_age_sec": self.max_age_sec,
+        }
+
+    def collect(self) -> List[str]:
+        """
+        Evict expired jobs, then least recently accessed jobs until under quota.
+
+        Returns:
+            Evicted job ids
+        """
+        now = time.time()
+        groups = self._scan()
+        total = sum(g["bytes"] for g in groups.values())
+
+        # Jobs still being written are never candidates
+        candidates = {
+            job_id: g for job_id, g in groups.items()
+            if now - g["created"] >= self.min_age_sec
+        }
+
+        evicted = []
+        if self.max_age_sec is not None:
+            for job_id, g in list(candidates.items()):
+                if now - g["created"] > self.max_age_sec:
+                    total -= self._evict(job_id, g)
+                    evicted.append(job_id)
+                    del candidates[job_id]
+
+        if self.max_bytes is not None and total > self.max_bytes:
+            for job_id, g in sorted(candidates.items(), key=lambda item: item[1]["accessed"]):
+                if total <= self.max_bytes:
+                    break
+                total -= self._evict(job_id, g)
+                evicted.append(job_id)
+
+        return evicted
+
+    def _evict(self, job_id: str, group: dict) -> int:
+        """Delete a job's files; returns the bytes freed."""
+        for path in group["paths"]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # Another node's collector got there first
+        if self.on_evict:
+            self.on_evict(job_id)
+        return group["bytes"]
+
+    def start(self) -> None:
+        """Start the background garbage collector (no-op without quotas)."""
+        if self._thread or (self.max_bytes is None and self.max_age_sec is None):
+            return
+        self._thread = threading.Thread(target=self._run, name="orpheus-storage-gc", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                evicted = self.collect()
+                if evicted:
+                    print(f"Storage GC evicted {len(evicted)} job(s)")
+            except Exception as e:
+                print(f"Storage GC failed: {e}")
+            self._stop.wait(self.gc_interval)
@@ -0,0 +1,198 @@
+"""
+Waveform Overview Module
+Precomputes compact waveform peaks and spectrogram thumbnails for the UI,
+so the browser can draw a track without downloading and decoding the WAV.
+"""
+
+import struct
+import zlib
+import numpy as np
+from typing import List
+
+class WaveformAnalyzer:
+    """Builds multi-resolution peak summaries and mel-spectrogram thumbnails."""
+
+    def __init__(self, sample_rate: int = 32000):
+        self.sample_rate = sample_rate
+
+    def compute_peaks(self, audio: np.ndarray,
+                      samples_per_peak: int = 1024,
+                      levels: int = 6,
+                      chunk_peaks: int = 256) -> dict:
+        """
+        Compute min/max peak pairs at several zoom levels.
+
+        The finest level is reduced straight from the samples (all channels
+        at once, chunk_peaks blocks at a time so a disk-backed track is never
+        copied whole); each coarser level halves the previous one, so the
+        extra levels cost almost nothing. Values are quantized to int8
+        (-127..127) to keep the JSON small.
+
+        Args:
+            audio: Audio array, (samples,) or (channels, samples), in [-1, 1]
+            samples_per_peak: Samples per min/max pair at the finest level
+            levels: Number of zoom levels
+            chunk_peaks: Blocks reduced per step
+
+        Returns:
+            Dict with track info and a list of levels, finest first
+        """
+        planar = audio.reshape(-1, audio.shape[-1])
+        num_channels, num_samples = planar.shape
+
+        # Reduce whole blocks over (channels, block), a chunk of blocks per call
+        full_blocks = num_samples // samples_per_peak
+        mins = np.empty(full_blocks, dtype=planar.dtype)
+        maxs = np.empty(full_blocks, dtype=planar.dtype)
+        for first in range(0, full_blocks, chunk_peaks):
+            last = min(first + chunk_peaks, full_blocks)
+            body = planar[:, first * samples_per_peak:last * samples_per_peak]
+            body = body.reshape(num_channels, last - first, samples_per_peak)
+            mins[first:last] = body.min(axis=(0, 2))
+            maxs[first:last] = body.max(axis=(0, 2))
+
+        # Trailing partial block
+        if num_samples % samples_per_peak:
+            tail = planar[:, full_blocks * samples_per_peak:]
+            mins = np.append(mins, tail.min())
+            maxs = np.append(maxs, tail.max())
+
+        result_levels = []
+        for level in range(levels):
+            result_levels.append({
+                "samples_per_peak": samples_per_peak << level,
+                "min": self._quantize(mins),
+                "max": self._quantize(maxs),
+            })
+            if len(mins) <= 1:
+                break
+
+            # Halve the resolution by pairing neighbouring peaks
+            if len(mins) % 2:
+                mins = np.append(mins, mins[-1])
+                maxs = np.append(maxs, maxs[-1])
+            mins = mins.reshape(-1, 2).min(axis=1)
+            maxs = maxs.reshape(-1, 2).max(axis=1)
+
+        return {
+            "sample_rate": self.sample_rate,
+            "channels": num_channels,
+            "duration_sec": num_samples / self.sample_rate,
+            "levels": result_levels,
+        }
+
+    def _quantize(self, values: np.ndarray) -> List[int]:
+        """Scale peaks in [-1, 1] to int8 and return them as a plain list."""
+        return np.clip(np.rint(values * 127), -127, 127).astype(np.int8).tolist()
+
+    def mel_spectrogram(self, audio: np.ndarray,
+                        width: int = 512,
+                        n_mels: int = 64,
+                        n_fft: int = 2048,
+                        top_db: float = 80.0) -> np.ndarray:
+        """
+        Compute a small log-mel spectrogram image.
+
+        Args:
+            audio: Audio array, (samples,) or (channels, samples)
+            width: Number of time columns in the image
+            n_mels: Number of mel bands (image height)
+            n_fft: FFT size
+            top_db: Dynamic range mapped onto 0..255
+
+        Returns:
+            uint8 array of shape (n_mels, width), low frequencies at the bottom
+        """
+        planar = audio.reshape(-1, audio.shape[-1])
+        if planar.shape[-1] < n_fft:
+            planar = np.pad(planar, ((0, 0), (0, n_fft - planar.shape[-1])))
+
+        # One frame per output column; only those frames are read and
+        # downmixed to mono, so memory does not grow with track length
+        hop = max(1, (planar.shape[-1] - n_fft) // max(1, width - 1))
+        starts = np.arange(0, planar.shape[-1] - n_fft + 1, hop)[:width]
+        frames = np.empty((len(starts), n_fft), dtype=np.float32)
+        for i, start in enumerate(starts):
+            planar[:, start:start + n_fft].mean(axis=0, dtype=np.float32, out=frames[i])
+        windowed = frames * np.hanning(n_fft).astype(np.float32)
+        power = np.abs(np.fft.rfft(windowed, axis=-1)) ** 2
+
+        mel_power = power @ self._mel_filterbank(n_fft, n_mels).T
+        db = 10.0 * np.log10(np.maximum(mel_power, 1e-10))
+        db = np.maximum(db, db.max() - top_db)
+
+        scaled = (db - db.min()) / max(db.max() - db.min(), 1e-6)
+        image = np.rint(scaled * 255).astype(np.uint8)
+
+        return image.T[::-1]
+
+    def _mel_filterbank(self, n_fft: int, n_mels: int) -> np.ndarray:
+        """Triangular mel filters, shape (n_mels, n_fft // 2 + 1)."""
+        def hz_to_mel(hz):
+            return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+        def mel_to_hz(mel):
+            return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+        fft_freqs = np.linspace(0, self.sample_rate / 2, n_fft // 2 + 1)
+        mel_points = np.linspace(hz_to_mel(0.0), hz_to_mel(self.sample_rate / 2), n_mels + 2)
+        hz_points = mel_to_hz(mel_points)
+
+        lower = hz_points[:-2, None]
+        center = hz_points[1:-1, None]
+        upper = hz_points[2:, None]
+
+        rising = (fft_freqs - lower) / (center - lower)
+        falling = (upper - fft_freqs) / (upper - center)
+        return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+    def spectrogram_png(self, audio: np.ndarray, width: int = 512, n_mels: int = 64) -> bytes:
+        """
+        Render the mel spectrogram as an 8-bit grayscale PNG.
+        """
+        return encode_png(self.mel_spectrogram(audio, width=width, n_mels=n_mels))
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    """
+    Encode a 2-D uint8 array as a grayscale PNG (no imaging library needed).
+    """
+    height, width = image.shape
+
+    # Each scanline starts with filter type 0 (None)
+    raw = np.zeros((height, width + 1), dtype=np.uint8)
+    raw[:, 1:] = image
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        crc = zlib.crc32(tag + data) & 0xFFFFFFFF
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', crc)
+
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+        + chunk(b'IDAT', zlib.compress(raw.tobytes(), 9))
+        + chunk(b'IEND', b'')
+    )
+
+
+if __name__ == "__main__":
+    import json
+
+    # Test the analyzer
+    analyzer = WaveformAnalyzer(sample_rate=32000)
+
+    # Create test signal (30 seconds, rising chirp)
+    duration = 30.0
+    t = np.linspace(0, duration, int(duration * analyzer.sample_rate), dtype=np.float32)
+    test_audio = np.sin(2 * np.pi * (200 + 100 * t) * t) * np.linspace(0.1, 0.9, len(t), dtype=np.float32)
+
+    print("Testing WaveformAnalyzer...")
+    peaks = analyzer.compute_peaks(test_audio)
+    for level in peaks["levels"]:
+        print(f"  {level['samples_per_peak']:6d} samples/peak: {len(level['max'])} pairs")
+    print(f"Peaks JSON size: {len(json.dumps(peaks, separators=(',', ':')))} bytes")
+
+    png = analyzer.spectrogram_png(test_audio)
+    print(f"Spectrogram PNG size: {len(png)} bytes")
+
+    print("\nAll tests passed!")
@@ -10,6 +10,7 @@ const elements = {
     planPanel: document.getElementById('planPanel'),
     outputPanel: document.getElementById('outputPanel'),
     audioPlayer: document.getElementById('audioPlayer'),
+    waveformCanvas: document.getElementById('waveformCanvas'),
     downloadBtn: document.getElementById('downloadBtn'),
     metadata: document.getElementById('metadata'),
     statusBadge: document.getElementById('statusBadge')
@@ -140,6 +141,7 @@ function handleComplete(data) {
     // Show Output
     elements.outputPanel.classList.remove('hidden');
     elements.audioPlayer.src = `${API_BASE}/download/${currentJobId}`;
+    loadWaveform(currentJobId);
 
     // Metadata
     elements.metadata.innerHTML = `
@@ -148,6 +150,54 @@ function handleComplete(data) {
     `;
 }
 
+// Waveform Preview (precomputed peaks, a few KB instead of the whole WAV)
+async function loadWaveform(jobId) {
+    const canvas = elements.waveformCanvas;
+    if (!canvas) return;
+
+    try {
+        const response = await fetch(`${API_BASE}/peaks/${jobId}`);
+        if (!response.ok) return;
+        drawWaveform(canvas, await response.json());
+    } catch (error) {
+        console.error(error);
+    }
+}
+
+function drawWaveform(canvas, peaks) {
+    const ratio = window.devicePixelRatio || 1;
+    const width = Math.floor(canvas.clientWidth * ratio);
+    const height = Math.floor(canvas.clientHeight * ratio);
+    canvas.width = width;
+    canvas.height = height;
+
+    // Coarsest level that still has at least one peak pair per pixel column
+    const levels = peaks.levels;
+    let level = levels[0];
+    for (const candidate of levels) {
+        if (candidate.max.length >= width) level = candidate;
+    }
+
+    const ctx = canvas.getContext('2d');
+    const mid = height / 2;
+    const count = level.max.length;
+    ctx.clearRect(0, 0, width, height);
+    ctx.fillStyle = 'rgba(255, 255, 255, 0.7)';
+
+    for (let x = 0; x < width; x++) {
+        const start = Math.floor(x * count / width);
+        const end = Math.max(start + 1, Math.floor((x + 1) * count / width));
+        let lo = 127, hi = -127;
+        for (let i = start; i < end; i++) {
+            lo = Math.min(lo, level.min[i]);
+            hi = Math.max(hi, level.max[i]);
+        }
+        const top = mid - (hi / 127) * mid;
+        const bottom = mid - (lo / 127) * mid;
+        ctx.fillRect(x, top, 1, Math.max(1, bottom - top));
+    }
+}
+
 // Render Plan Card (Premium Glassmorphism)
 function renderPlanCard(plan, isEditable = false) {
     if (!plan) return '';
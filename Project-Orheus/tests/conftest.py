@@ -0,0 +1,40 @@
+import os
+import sys
+import importlib
+from concurrent.futures import Executor, Future
+
+import pytest
+
+# Tests import the modules in src/ directly, the same way api_server does
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+PROJECT_ROOT = os.path.join(os.path.dirname(__file__), '..')
+
+
+class InlineExecutor(Executor):
+    """Runs submitted calls immediately, so background file writes finish before asserts."""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """api_server imported fresh in api mode (no model), with inline I/O."""
+    pytest.importorskip("fastapi")
+    pytest.importorskip("uvicorn")
+    monkeypatch.chdir(PROJECT_ROOT)
+    monkeypatch.syspath_prepend(PROJECT_ROOT)
+    monkeypatch.setenv("ORPHEUS_MODE", "api")
+    monkeypatch.setenv("ORPHEUS_JOB_STORE", f"sqlite:///{tmp_path / 'jobs.db'}")
+    monkeypatch.setenv("ORPHEUS_OUTPUT_DIR", str(tmp_path / "outputs"))
+    sys.modules.pop("api_server", None)
+    api_server = importlib.import_module("api_server")
+    monkeypatch.setattr(api_server, "io_executor", InlineExecutor())
+    yield api_server
+    sys.modules.pop("api_server", None)
@@ -0,0 +1,140 @@
+import sys
+from types import SimpleNamespace
+
+import pytest
+from duration import MUSICGEN_NUM_CODEBOOKS, plan_duration
+
+
+def make_model(generate=None):
+    """Stub MusicGen: configs for the budget, and a generate() that runs the decoder."""
+    model = SimpleNamespace(
+        config=SimpleNamespace(audio_encoder=SimpleNamespace(frame_rate=50, sampling_rate=32000)),
+        decoder=SimpleNamespace(config=SimpleNamespace(num_codebooks=4), forward=lambda *args: "eager"),
+        calls=[],
+    )
+
+    def default_generate(max_new_tokens, **kwargs):
+        model.calls.append(max_new_tokens)
+        return model.decoder.forward()
+
+    model.generate = generate or default_generate
+    return model
+
+
+@pytest.fixture
+def warm_server(server, monkeypatch):
+    """api_server with a stub model that still has to be warmed up."""
+    monkeypatch.setattr(server, "model", make_model())
+    monkeypatch.setattr(server, "processor", lambda **kwargs: {})
+    server.ready.clear()
+    return server
+
+
+@pytest.fixture
+def client(server):
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+    return TestClient(server.app)
+
+
+def test_api_budget_matches_worker_budget(server, client):
+    budget = client.post("/plan", json={"prompt": "calm piano", "duration_sec": 30}).json()["duration"]
+
+    # What a worker running MusicGen (4 codebooks) computes for the same request
+    expected = plan_duration(30.0, server.stitcher, max_segment_sec=server.MAX_SEGMENT_SEC,
+                             fade_sec=server.MAX_CROSSFADE_SEC, delay_steps=MUSICGEN_NUM_CODEBOOKS - 1,
+                             beat_sec=60.0 / server.DEFAULT_BPM)
+    assert budget["tokens_per_segment"] == expected["tokens_per_segment"]
+    assert budget["segments"] == expected["segments"]
+    assert budget["estimated_compute_sec"] is None
+
+
+def test_api_estimates_from_worker_timings(server, client, monkeypatch):
+    # A worker publishes each timing to the shared store...
+    monkeypatch.setattr(server, "MODE", "worker")
+    server.record_timing(250, 6.0)
+    server.record_timing(750, 16.0)
+    assert server.jobs.get_meta(server.COMPUTE_TIMINGS_META) == [[250, 6.0], [750, 16.0]]
+
+    # ...and an API node with no timings of its own estimates from them
+    monkeypatch.setattr(server, "MODE", "api")
+    server.compute_estimator.load([])
+    response = client.post("/generate", json={"prompt": "calm piano", "duration": "short"}).json()
+    budget = response["metadata"]
+    assert response["status"] == "queued"
+    assert budget["estimated_compute_sec"] == pytest.approx(
+        (1.0 + 0.02 * budget["tokens_per_segment"]) * budget["segments"])
+
+
+def test_warmup_sets_ready_and_seeds_estimates(warm_server):
+    warm_server.warmup()
+    assert warm_server.ready.is_set()
+    # One generation per distinct preset budget, each timed
+    assert len(warm_server.model.calls) == len(warm_server.compute_estimator.samples()) > 0
+    assert warm_server.compute_estimator.estimate(500) is not None
+
+
+def test_warmup_failure_leaves_instance_unready(warm_server, monkeypatch):
+    def generate(**kwargs):
+        raise RuntimeError("out of memory")
+
+    monkeypatch.setattr(warm_server.model, "generate", generate)
+    warm_server.warmup()
+    assert not warm_server.ready.is_set()
+
+
+def test_failed_compile_trial_restores_eager_decoder(warm_server, monkeypatch):
+    original = warm_server.model.decoder.forward
+
+    def compile(fn, dynamic):
+        # Like inductor without a C++ toolchain: fails on the first call, not here
+        def compiled(*args):
+            raise RuntimeError("no C++ compiler")
+        return compiled
+
+    monkeypatch.setitem(sys.modules, "torch", SimpleNamespace(compile=compile))
+    assert warm_server.compile_decoder() is False
+    assert warm_server.model.decoder.forward is original
+
+    # Generation still works on the restored decoder
+    warm_server.warmup()
+    assert warm_server.ready.is_set()
+
+
+def test_working_compile_keeps_compiled_decoder(warm_server, monkeypatch):
+    monkeypatch.setitem(sys.modules, "torch", SimpleNamespace(compile=lambda fn, dynamic: lambda *args: "compiled"))
+    assert warm_server.compile_decoder() is True
+    assert warm_server.model.decoder.forward() == "compiled"
+
+
+def test_status_and_download_go_through_the_io_executor(server, client, monkeypatch):
+    calls = []
+    run_io = server.run_io
+
+    async def counting_run_io(func, *args):
+        calls.append(getattr(func, "__name__", func))
+        return await run_io(func, *args)
+
+    monkeypatch.setattr(server, "run_io", counting_run_io)
+
+    assert client.get("/status/missing").status_code == 404
+    assert client.get("/download/missing").status_code == 404
+
+    job_id = client.post("/generate", json={"prompt": "calm piano"}).json()["job_id"]
+    status = client.get(f"/status/{job_id}").json()
+    assert status["status"] == "queued"
+    assert status["metadata"]["segments"] >= 1
+    assert client.get(f"/download/{job_id}").status_code == 400
+    assert client.get(f"/peaks/{job_id}").status_code == 400
+
+    # Every job-store read and write ran off the event loop
+    assert calls.count("get") == 5 and calls.count("enqueue") == 1
+
+
+def test_expired_jobs_are_gone(server, client):
+    server.jobs.create("old", {"status": "expired"})
+    assert client.get("/status/old").json()["metadata"]["error"] == server.EXPIRED_MESSAGE
+    for endpoint in ("download", "peaks", "spectrogram"):
+        response = client.get(f"/{endpoint}/old")
+        assert response.status_code == 410
+        assert response.json()["detail"] == server.EXPIRED_MESSAGE
@@ -0,0 +1,135 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from audio_codes import capture_audio_codes, code_key, load_codes, save_codes
+
+
+class FakeTensor:
+    """Just enough of a torch tensor for capture_audio_codes."""
+
+    def __init__(self, array):
+        self.array = array
+
+    def detach(self):
+        return self
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+def make_model():
+    calls = []
+
+    def decode(audio_codes, audio_scales=None):
+        calls.append(audio_codes)
+        return "audio"
+
+    return SimpleNamespace(audio_encoder=SimpleNamespace(decode=decode)), calls
+
+
+def test_capture_records_every_decode_and_restores():
+    model, calls = make_model()
+    original = model.audio_encoder.decode
+
+    with capture_audio_codes(model) as captured:
+        # Stereo models decode each channel's codebooks separately
+        assert model.audio_encoder.decode(FakeTensor(np.zeros(3)), audio_scales=[None]) == "audio"
+        model.audio_encoder.decode(FakeTensor(np.ones(3)))
+
+    assert [c.numpy().tolist() for c in captured] == [[0, 0, 0], [1, 1, 1]]
+    assert len(calls) == 2
+    assert model.audio_encoder.decode is original
+
+
+def test_capture_restores_decoder_on_error():
+    model, _ = make_model()
+    original = model.audio_encoder.decode
+    with pytest.raises(RuntimeError):
+        with capture_audio_codes(model):
+            raise RuntimeError("generate failed")
+    assert model.audio_encoder.decode is original
+
+
+def test_codes_roundtrip_in_segment_and_part_order(tmp_path):
+    path = tmp_path / "job.codes.npz"
+    codes = {}
+    # Inserted out of order, and with two-digit indices that sort wrongly as text
+    for segment, part in [(10, 1), (2, 0), (10, 0), (0, 0)]:
+        codes[code_key(segment, part)] = np.full((1, 4, 5), segment * 10 + part, dtype=np.int16)
+    save_codes(path, codes)
+
+    loaded = load_codes(path)
+    assert [[int(p[0, 0, 0]) for p in parts] for parts in loaded] == [[0], [20], [100, 101]]
+    assert loaded[0][0].dtype == np.int16
+
+
+def test_load_codes_rejects_unknown_entries(tmp_path):
+    path = tmp_path / "bad.npz"
+    np.savez_compressed(path, stray=np.zeros(1))
+    with pytest.raises(ValueError, match="stray"):
+        load_codes(path)
+
+
+@pytest.fixture
+def server(server, monkeypatch):
+    """The api_server fixture with a stub decoder standing in for the EnCodec model."""
+    def decode_audio_codes(parts):
+        # Deterministic "audio" derived from the stored codes
+        rng = np.random.default_rng(int(parts[0].sum()))
+        return (rng.standard_normal(64000) * 0.1).astype(np.float32)
+
+    monkeypatch.setattr(server, "model", SimpleNamespace(
+        config=SimpleNamespace(audio_encoder=SimpleNamespace(sampling_rate=32000))))
+    monkeypatch.setattr(server, "decode_audio_codes", decode_audio_codes)
+    return server
+
+
+def test_process_rerender_from_stored_codes(server):
+    source_id = "00000000-0000-0000-0000-000000000000"
+    codes_path = server.storage.path_for(source_id, ".codes.npz")
+    save_codes(codes_path, {code_key(i, 0): np.full((1, 4, 10), i + 1, dtype=np.int16) for i in range(2)})
+    server.jobs.create(source_id, {
+        "status": "completed",
+        "codes_path": str(codes_path),
+        "metadata": {"seed": 7, "plan": {"genre": "pop"}, "target_duration_sec": None},
+    })
+
+    request = server.GenerationRequest(prompt="test", apply_fades=False, normalize=True)
+    wavs = []
+    for n in range(2):
+        job_id = f"1111111{n}-0000-0000-0000-000000000000"
+        server.process_rerender(job_id, source_id, request)
+        job = server.jobs.get(job_id)
+        assert job["status"] == "completed", job.get("error")
+        assert job["metadata"]["rerender_of"] == source_id
+        assert job["metadata"]["num_segments"] == 2
+        assert job["metadata"]["channels"] == 1
+        assert job["metadata"]["seed"] == 7
+        wavs.append(open(job["filepath"], "rb").read())
+
+    # Same codes, options and seed: the same file
+    assert wavs[0] == wavs[1]
+
+
+def test_process_rerender_fails_without_codes(server):
+    source_id = "22222222-0000-0000-0000-000000000000"
+    server.jobs.create(source_id, {"status": "completed", "codes_path": "/nonexistent.npz"})
+    job_id = "33333333-0000-0000-0000-000000000000"
+    server.process_rerender(job_id, source_id, server.GenerationRequest(prompt="test"))
+    assert server.jobs.get(job_id)["status"] == "failed"
+
+
+@pytest.mark.parametrize("seed", [-1, 2 ** 63, 2 ** 64])
+def test_out_of_range_seed_is_rejected_up_front(server, seed):
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+
+    # Rejected when the request is parsed, not after every segment ran
+    client = TestClient(server.app)
+    response = client.post("/generate", json={"prompt": "test", "seed": seed})
+    assert response.status_code == 422
+    assert server.GenerationRequest(prompt="test", seed=2 ** 63 - 1).seed == 2 ** 63 - 1
@@ -0,0 +1,73 @@
+import numpy as np
+import scipy.io.wavfile
+from audio_processor import AudioProcessor
+
+
+def test_process_keeps_float32():
+    proc = AudioProcessor(sample_rate=8000)
+    audio = np.sin(np.linspace(0, 100, 16000)) * 0.5  # float64 input
+    result = proc.process(audio, normalize=True, fades=True, compress=True)
+    assert result.dtype == np.float32
+    assert result[0] == 0.0
+    assert np.abs(result).max() <= 1.0
+
+
+def test_write_wav_roundtrip(tmp_path):
+    proc = AudioProcessor(sample_rate=8000)
+    audio = (np.sin(np.linspace(0, 200, 100001)) * 0.9).astype(np.float32)
+    path = tmp_path / "out.wav"
+    proc.write_wav(str(path), audio, chunk_size=4096)
+
+    rate, data = scipy.io.wavfile.read(str(path))
+    assert rate == 8000
+    assert data.dtype == np.int16
+    assert len(data) == len(audio)
+    # Dither adds at most one LSB either side of the rounded value
+    assert np.abs(data.astype(np.float32) - audio * 32767).max() <= 2.0
+
+
+def test_write_wav_clips_out_of_range(tmp_path):
+    proc = AudioProcessor(sample_rate=8000)
+    path = tmp_path / "clip.wav"
+    proc.write_wav(str(path), np.array([2.0, -2.0], dtype=np.float32), dither=False)
+    _, data = scipy.io.wavfile.read(str(path))
+    assert data.tolist() == [32767, -32768]
+
+
+def test_stereo_fades_broadcast():
+    proc = AudioProcessor(sample_rate=8000)
+    stereo = np.ones((2, 16000), dtype=np.float32)
+    result = proc.apply_fades(stereo)
+    assert result.shape == (2, 16000)
+    assert np.array_equal(result[0], result[1])
+    assert result[:, 0].tolist() == [0.0, 0.0]
+    assert result[:, -1].tolist() == [0.0, 0.0]
+
+
+def test_write_wav_stereo_interleaves(tmp_path):
+    proc = AudioProcessor(sample_rate=8000)
+    stereo = np.stack([np.full(1000, 0.5), np.full(1000, -0.5)]).astype(np.float32)
+    path = tmp_path / "stereo.wav"
+    proc.write_wav(str(path), stereo, dither=False, chunk_size=300)
+    _, data = scipy.io.wavfile.read(str(path))
+    assert data.shape == (1000, 2)
+    assert (data[:, 0] == 16384).all() and (data[:, 1] == -16384).all()
+
+
+def test_write_wav_seeded_dither_is_reproducible(tmp_path):
+    proc = AudioProcessor(sample_rate=8000)
+    audio = (np.sin(np.linspace(0, 200, 20000)) * 0.5).astype(np.float32)
+    paths = [tmp_path / f"{name}.wav" for name in ("a", "b")]
+    for path in paths:
+        proc.write_wav(str(path), audio, dither_seed=42)
+    assert paths[0].read_bytes() == paths[1].read_bytes()
+
+
+def test_process_in_place_matches_copy():
+    proc = AudioProcessor(sample_rate=8000)
+    stereo = (np.random.default_rng(4).standard_normal((2, 300000)) * 0.4).astype(np.float32)
+    expected = proc.process(stereo, compress=True)
+
+    result = proc.process(stereo, compress=True, copy=False)
+    assert result is stereo
+    assert np.array_equal(result, expected)
@@ -0,0 +1,72 @@
+import numpy as np
+from audio_stitcher import AudioStitcher
+
+
+def test_stitch_matches_pairwise_crossfade():
+    stitcher = AudioStitcher(sample_rate=8000)
+    rng = np.random.default_rng(0)
+    segments = [rng.standard_normal(n).astype(np.float32) for n in (80000, 30000, 120000)]
+
+    stitched = stitcher.stitch_segments(segments, fade_duration=6.0, use_beat_align=False)
+
+    expected = segments[0]
+    for segment in segments[1:]:
+        expected = stitcher.crossfade(expected, segment, fade_duration=6.0)
+    assert stitched.dtype == np.float32
+    assert np.allclose(stitched, expected)
+
+
+def test_stitch_stereo_segments():
+    stitcher = AudioStitcher(sample_rate=8000)
+    segments = [np.ones((2, 40000), dtype=np.float32) for _ in range(3)]
+    stitched = stitcher.stitch_segments(segments, fade_duration=1.0)
+    assert stitched.shape[0] == 2
+    assert stitched.shape[-1] < 3 * 40000
+    # Loudness stays constant through equal-power crossfades of identical input
+    assert np.allclose(stitched, 1.0)
+
+
+def test_adaptive_crossfade_finds_matching_overlap():
+    stitcher = AudioStitcher(sample_rate=16000)
+    rng = np.random.default_rng(1)
+    # A sequence of short random tones, so every alignment sounds different
+    tones = [np.sin(2 * np.pi * rng.uniform(100, 6000) * np.arange(1500) / 16000) for _ in range(200)]
+    signal = np.concatenate(tones).astype(np.float32)
+
+    # audio2 starts with the last 31 * 1024 samples of audio1
+    overlap = 31 * 1024
+    audio1, audio2 = signal[:150000], signal[150000 - overlap:]
+
+    assert stitcher.choose_crossfade(audio1, audio2, min_fade=1.0, max_fade=3.0) == overlap
+
+
+def test_segment_budget_reaches_target_duration():
+    stitcher = AudioStitcher(sample_rate=32000)
+    for target, segments, fade in [(24.0, 3, 3.0), (36.0, 3, 3.0), (20.0, 4, 6.0), (5.0, 1, 3.0)]:
+        segment = stitcher.segment_duration_for(target, segments, fade)
+        assert np.isclose(stitcher.usable_duration(segment, segments, fade), target)
+
+
+def test_blend_into_matches_crossfade():
+    stitcher = AudioStitcher(sample_rate=8000)
+    rng = np.random.default_rng(2)
+    a = rng.standard_normal((2, 30000)).astype(np.float32)
+    b = rng.standard_normal((2, 30000)).astype(np.float32)
+
+    fade = stitcher.fade_length(1.0, a.shape[-1], b.shape[-1])
+    head = b.copy()
+    stitcher.blend_into(a[..., -fade:], head[..., :fade])
+
+    expected = stitcher.crossfade(a, b, fade_duration=1.0)
+    assert np.allclose(head, expected[..., a.shape[-1] - fade:], atol=1e-6)
+
+
+def test_match_loudness_in_place():
+    stitcher = AudioStitcher(sample_rate=8000)
+    rng = np.random.default_rng(5)
+    segments = [rng.standard_normal(1000).astype(np.float32) * scale for scale in (0.1, 0.5)]
+    expected = stitcher.match_loudness(segments)
+
+    matched = stitcher.match_loudness(segments, copy=False)
+    assert all(out is seg for out, seg in zip(matched, segments))
+    assert all(np.array_equal(out, exp) for out, exp in zip(matched, expected))
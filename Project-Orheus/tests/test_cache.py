@@ -0,0 +1,35 @@
+from cache import LRUCache
+from planner import MusicPlanner
+
+
+def test_lru_eviction_and_stats():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recent
+    cache.put("c", 3)           # evicts "b"
+    assert cache.get("b") is None
+    assert cache.get_or_compute("c", lambda: 99) == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 2)
+
+
+def test_planner_cache_normalizes_prompts():
+    planner = MusicPlanner()
+    first = planner.plan("Sad  Jazz at 80 BPM")
+    second = planner.plan("sad jazz at 80 bpm ")
+    assert planner.plan_cache.stats()["hits"] == 1
+    # Cached analysis, but each plan keeps its own prompt and is a fresh dict
+    assert first["original_prompt"] == "Sad  Jazz at 80 BPM"
+    assert second["original_prompt"] == "sad jazz at 80 bpm "
+    assert (first["genre"], first["mood"], first["bpm"]) == (second["genre"], second["mood"], second["bpm"])
+    first["instruments"].append("kazoo")
+    assert planner.plan("sad jazz at 80 bpm")["instruments"] == []
+
+
+def test_plan_many_uses_cache():
+    planner = MusicPlanner()
+    planner.plan("energetic metal")
+    plans = planner.plan_many(["energetic metal", "calm piano", "calm piano"])
+    assert [p["mood"] for p in plans] == ["energetic", "relaxed", "relaxed"]
+    assert len(planner.plan_cache) == 2
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+from audio_processor import AudioProcessor
+from audio_stitcher import AudioStitcher
+from duration import ComputeEstimator, StreamingTrackWriter, plan_duration
+
+
+def make_segments(count, length, channels=None):
+    """Noise segments with identical RMS, so running and global loudness matching agree."""
+    rng = np.random.default_rng(0)
+    shape = (length,) if channels is None else (channels, length)
+    segments = []
+    for _ in range(count):
+        segment = rng.standard_normal(shape).astype(np.float32)
+        segments.append(segment * np.float32(0.2 / np.sqrt(np.mean(segment ** 2))))
+    return segments
+
+
+def test_streaming_matches_batch_stitch(tmp_path):
+    stitcher = AudioStitcher(sample_rate=8000)
+    processor = AudioProcessor(sample_rate=8000)
+
+    for channels in (None, 2):
+        segments = make_segments(4, 60000, channels)
+
+        writer = StreamingTrackWriter(tmp_path / f"track{channels}.f32", stitcher, processor)
+        for segment in segments:
+            writer.add(segment)
+        streamed = writer.finish()
+
+        expected = stitcher.stitch_segments(stitcher.match_loudness(segments), fade_duration=3.0,
+                                            adaptive=True, min_fade_duration=1.0)
+        expected = processor.process(expected, normalize=True, fades=True)
+
+        assert streamed.shape == expected.shape
+        assert np.allclose(streamed, expected, atol=1e-5)
+
+
+def test_streaming_trims_to_target(tmp_path):
+    stitcher = AudioStitcher(sample_rate=8000)
+    processor = AudioProcessor(sample_rate=8000)
+    plan = plan_duration(40.0, stitcher, max_segment_sec=10.0)
+
+    writer = StreamingTrackWriter(tmp_path / "track.f32", stitcher, processor,
+                                  use_beat_align=False, max_samples=40 * 8000)
+    for segment in make_segments(plan["segments"], int(plan["segment_sec"] * 8000)):
+        writer.add(segment)
+
+    assert writer.finish().shape == (40 * 8000,)
+
+
+def test_plan_duration_reaches_target():
+    stitcher = AudioStitcher(sample_rate=32000)
+    for target in (5.0, 24.0, 95.0, 600.0):
+        plan = plan_duration(target, stitcher, frame_rate=50, max_segment_sec=15.0, fade_sec=3.0)
+        assert plan["segment_sec"] <= 15.0
+        assert stitcher.usable_duration(plan["segment_sec"], plan["segments"], 3.0) >= target - 1e-9
+        assert plan["tokens_per_segment"] >= plan["segment_sec"] * 50
+
+
+def test_compute_estimator_fits_timings():
+    estimator = ComputeEstimator()
+    assert estimator.estimate(500) is None
+
+    estimator.record(250, 6.0)
+    assert np.isclose(estimator.estimate(500, segments=2), 24.0)
+
+    estimator.record(750, 16.0)
+    assert np.isclose(estimator.estimate(500), 11.0)
+
+    # Timings published by another process give the same estimates
+    other = ComputeEstimator()
+    other.load(estimator.samples())
+    assert np.isclose(other.estimate(500), 11.0)
+
+
+def test_plan_duration_is_closed_form():
+    stitcher = AudioStitcher(sample_rate=32000)
+    # Huge targets are answered immediately rather than by counting up
+    plan = plan_duration(1e12, stitcher, max_segment_sec=15.0, fade_sec=3.0)
+    assert plan["segments"] == int(np.ceil((1e12 - 3.0) / 12.0))
+    for bad in (0.0, -5.0):
+        with pytest.raises(ValueError):
+            plan_duration(bad, stitcher)
+
+
+@pytest.mark.parametrize("target", [48.0, 61.0, 95.0])
+def test_beat_aligned_budget_survives_longest_crossfades(tmp_path, target):
+    sample_rate = 8000
+    stitcher = AudioStitcher(sample_rate=sample_rate)
+    processor = AudioProcessor(sample_rate=sample_rate)
+    plan = plan_duration(target, stitcher, frame_rate=50, max_segment_sec=15.0, fade_sec=3.0,
+                         beat_sec=60.0 / stitcher.analyze_tempo(None))
+
+    # Segments exactly as long as the token budget, every crossfade at its
+    # maximum (not adaptive), beat alignment on
+    writer = StreamingTrackWriter(tmp_path / "track.f32", stitcher, processor, fade_duration=3.0,
+                                  adaptive=False, use_beat_align=True,
+                                  max_samples=int(target * sample_rate))
+    length = plan["tokens_per_segment"] * sample_rate // 50
+    for segment in make_segments(plan["segments"], length):
+        writer.add(segment)
+
+    assert writer.finish().shape == (int(target * sample_rate),)
+
+
+def test_abort_removes_partial_track(tmp_path):
+    stitcher = AudioStitcher(sample_rate=8000)
+    processor = AudioProcessor(sample_rate=8000)
+    path = tmp_path / "track.f32"
+
+    writer = StreamingTrackWriter(path, stitcher, processor, use_beat_align=False)
+    for segment in make_segments(2, 40000):
+        writer.add(segment)
+    assert path.exists()
+
+    writer.abort()
+    assert writer._file.closed
+    assert not path.exists()
+    # Safe to call again (e.g. from a second cleanup path)
+    writer.abort()
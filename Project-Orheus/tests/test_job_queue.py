@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+from job_queue import JobStore, SQLiteJobStore, create_job_store
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def store(request, tmp_path, monkeypatch):
+    if request.param == "memory":
+        return create_job_store("memory")
+    if request.param == "redis":
+        # In-process fake of the Redis protocol; no server needed
+        fakeredis = pytest.importorskip("fakeredis")
+        import redis
+        server = fakeredis.FakeServer()
+        monkeypatch.setattr(redis.Redis, "from_url", lambda url: fakeredis.FakeRedis(server=server))
+        return create_job_store("redis://localhost:6379/0")
+    return create_job_store(f"sqlite:///{tmp_path / 'jobs.db'}")
+
+
+def test_create_update_get(store):
+    store.create("a", {"status": "processing", "request": {"prompt": "x"}})
+    store.update("a", {"metadata": {"progress": "1/3"}})
+    job = store.get("a")
+    assert job["status"] == "processing"
+    assert job["metadata"] == {"progress": "1/3"}
+    assert "a" in store and "b" not in store
+    assert store.get("b") is None
+
+
+def test_claim_in_order(store):
+    for job_id in ["first", "second"]:
+        store.create(job_id, {"status": "queued"})
+        store.enqueue(job_id, {"prompt": job_id})
+    assert store.claim("w1", timeout=0.1) == ("first", {"prompt": "first"})
+    assert store.get("first")["status"] == "processing"
+    assert store.claim("w1", timeout=0.1)[0] == "second"
+    assert store.claim("w1", timeout=0.1) is None
+
+
+def test_sqlite_claim_skips_rows_without_payload(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    # Created as queued, but enqueue() has not stored the payload yet
+    store.create("early", {"status": "queued"})
+    assert store.claim("w1", timeout=0.1) is None
+    assert store.get("early")["status"] == "queued"
+
+    store.enqueue("early", {"prompt": "x"})
+    assert store.claim("w1", timeout=0.1) == ("early", {"prompt": "x"})
+
+
+def test_sqlite_workers_never_share_a_job(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    api = SQLiteJobStore(path)
+    for i in range(20):
+        api.create(str(i), {"status": "queued"})
+        api.enqueue(str(i), {})
+
+    claimed = []
+    def work(name):
+        worker_store = SQLiteJobStore(path, poll_interval=0.01)
+        while (item := worker_store.claim(name, timeout=0.1)) is not None:
+            claimed.append(item[0])
+
+    threads = [threading.Thread(target=work, args=(f"w{n}",)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claimed, key=int) == [str(i) for i in range(20)]
+
+
+def test_unknown_url():
+    with pytest.raises(ValueError):
+        create_job_store("postgres://nope")
+    assert isinstance(create_job_store(), JobStore)
+
+
+def test_meta_values_are_shared_outside_job_records(store):
+    assert store.get_meta("timings") is None
+    store.set_meta("timings", [[250, 6.0]])
+    store.set_meta("timings", [[250, 6.0], [750, 16.0]])
+    assert store.get_meta("timings") == [[250, 6.0], [750, 16.0]]
+    assert "timings" not in store
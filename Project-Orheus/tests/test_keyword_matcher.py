@@ -0,0 +1,29 @@
+from planner import KeywordMatcher, MusicPlanner
+
+
+def test_word_boundaries():
+    planner = MusicPlanner()
+    plan = planner.plan("grape soda jingle")
+    assert plan["genre"] == "pop"  # "rap" inside "grape" must not match
+
+
+def test_synonyms_and_longest_match():
+    planner = MusicPlanner()
+    plan = planner.plan("Chill Hip-Hop with acoustic guitar and synthesizer")
+    assert plan["genre"] == "hip hop"
+    assert plan["mood"] == "relaxed"
+    assert plan["instruments"] == ["acoustic guitar", "synth"]
+
+
+def test_custom_taxonomy():
+    matcher = KeywordMatcher({"genre": {"synthwave": ["retrowave"], "synth pop": []}})
+    assert matcher.find_all("retrowave meets synth pop") == [
+        (0, "genre", "synthwave"),
+        (16, "genre", "synth pop"),
+    ]
+
+
+def test_plan_many_matches_plan():
+    planner = MusicPlanner()
+    prompts = ["sad jazz at 80 bpm", "energetic metal", "", "piano\nballad 70 bpm", "ends with 90", "bpm first"]
+    assert planner.plan_many(prompts) == [planner.plan(p) for p in prompts]
@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+from lyrics import LyricAligner, LyricGenerator, LyricTemplateStore, count_syllables
+
+
+def test_count_syllables():
+    counts = count_syllables(["rain", "walking", "memories", "little", "make", "a", "feeling"])
+    assert counts.tolist() == [1, 2, 3, 2, 1, 1, 2]
+
+
+def test_onsets_snap_to_beat_grid():
+    aligner = LyricAligner()
+    timings = aligner.align("one two three four five six", duration_sec=30, bpm=120)
+    beat = 0.5
+    assert np.allclose(np.round(timings["start"] / beat) * beat, timings["start"])
+    assert np.all(np.diff(timings["start"]) > 0)
+    assert np.all(timings["end"] > timings["start"])
+    assert timings["end"][-1] == 30.0
+
+
+def test_sections_respected():
+    generator = LyricGenerator()
+    structure = ["Intro", "Verse", "Chorus", "Outro"]
+    lyrics = generator.generate("happy", structure)
+    timings = LyricAligner().align(lyrics, duration_sec=48, bpm=60, structure=structure)
+
+    # 48 beats split into 4 sections of 12; intro and outro are instrumental
+    assert set(timings["section"].tolist()) == {1, 2}
+    verse = timings[timings["section"] == 1]
+    chorus = timings[timings["section"] == 2]
+    assert verse["start"].min() == 12.0 and verse["end"].max() == 24.0
+    assert chorus["start"].min() == 24.0 and chorus["end"].max() == 36.0
+
+
+def test_dense_section_subdivides_beats():
+    timings = LyricAligner().align(" ".join(["la"] * 20), duration_sec=5, bpm=120)
+    # 10 beats for 20 words -> half-beat slots, all distinct
+    assert len(np.unique(timings["start"])) == 20
+    assert timings["start"].max() < 5.0
+
+
+def test_batch_matches_single():
+    aligner = LyricAligner()
+    songs = [
+        {"lyrics": "walking in the rain / feeling all the pain", "duration_sec": 20, "bpm": 90},
+        {"lyrics": "", "duration_sec": 10, "bpm": 100},
+        {"lyrics": "turn it up let's go", "duration_sec": 8, "bpm": 128},
+    ]
+    batch = aligner.align_batch(songs)
+    for song_id, song in enumerate(songs):
+        single = aligner.align(song["lyrics"], song["duration_sec"], song["bpm"])
+        rows = batch[batch["song"] == song_id]
+        assert np.array_equal(rows["start"], single["start"])
+        assert rows["word"].tolist() == single["word"].tolist()
+    assert "/" not in batch["word"].tolist()
+
+
+def test_template_store_shared_and_indexed(tmp_path):
+    corpus = tmp_path / "corpus.tsv"
+    corpus.write_text(
+        "# comment\n"
+        "calm\tverse\tSoft wind over water\n"
+        "calm\tchorus\tStay\n"
+        "calm\tverse\tHush\n"
+        "happy\tverse\tSun is up\n"
+    )
+    first = LyricGenerator(corpus_path=str(corpus))
+    second = LyricGenerator(corpus_path=str(corpus))
+    assert first.store is second.store
+
+    store = first.store
+    assert len(store) == 4
+    assert store.lines("calm", "verse") == ["Soft wind over water", "Hush"]
+    assert store.lines("calm", "verse", max_syllables=2) == ["Hush"]
+    assert store.lines("calm", "bridge") == []
+
+
+def test_template_store_syllable_lookup(tmp_path):
+    corpus = tmp_path / "corpus.tsv"
+    corpus.write_text(
+        "calm\tverse\tSoft wind over water\n"
+        "calm\tverse\tHush\n"
+        "calm\tverse\tRain on the roof\n"
+        "calm\tverse\tStill\n"
+    )
+    store = LyricTemplateStore(str(corpus))
+    assert store.lines("calm", "verse", max_syllables=0) == []
+    assert store.lines("calm", "verse", max_syllables=1) == ["Hush", "Still"]
+    assert store.lines("calm", "verse", max_syllables=4) == ["Hush", "Rain on the roof", "Still"]
+    assert store.lines("calm", "verse", max_syllables=4, limit=2) == ["Hush", "Rain on the roof"]
+    assert store.lines("calm", "verse", max_syllables=99) == store.lines("calm", "verse")
+
+
+def test_template_store_reports_bad_rows(tmp_path):
+    corpus = tmp_path / "corpus.tsv"
+    corpus.write_text("# header\ncalm\tverse\tHush\ncalm verse Still\n")
+    with pytest.raises(ValueError, match=r"corpus\.tsv:3:"):
+        LyricTemplateStore(str(corpus))
+
+
+def test_format_for_mood_memoized():
+    generator = LyricGenerator()
+    structure = ["Intro", "Verse", "Chorus", "Verse", "Outro"]
+    expected = generator.format_for_musicgen(generator.generate("sad", structure))
+    assert generator.format_for_mood("sad", structure) == expected
+    hits = generator.store.formatted.hits
+    assert generator.format_for_mood("SAD", structure) == expected
+    assert generator.store.formatted.hits == hits + 1
+    # Unknown moods fall back to happy
+    assert generator.format_for_mood("bored", ["Verse"]).startswith("Dancing through the day")
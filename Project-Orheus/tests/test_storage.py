@@ -0,0 +1,55 @@
+import os
+import time
+import uuid
+
+from storage import OutputStorage
+
+
+def make_job(storage, size, created, accessed=None):
+    job_id = str(uuid.uuid4())
+    for suffix in (".wav", ".peaks.json"):
+        path = storage.path_for(job_id, suffix)
+        path.write_bytes(b"\0" * size)
+        os.utime(path, (accessed or created, created))
+    return job_id
+
+
+def test_sharded_paths(tmp_path):
+    storage = OutputStorage(tmp_path)
+    path = storage.path_for("abcdef12-0000-0000-0000-000000000000", ".wav")
+    assert path.parent == tmp_path / "ab"
+    assert path.parent.is_dir()
+
+
+def test_age_quota(tmp_path):
+    now = time.time()
+    evicted = []
+    storage = OutputStorage(tmp_path, max_age_sec=3600, on_evict=evicted.append)
+    old = make_job(storage, 10, now - 7200)
+    new = make_job(storage, 10, now - 1200)
+    (tmp_path / "README.md").write_text("keep me")
+
+    assert storage.collect() == [old]
+    assert evicted == [old]
+    assert storage.job_files(old) == []
+    assert len(storage.job_files(new)) == 2
+    assert (tmp_path / "README.md").exists()
+
+
+def test_size_quota_evicts_least_recently_downloaded(tmp_path):
+    now = time.time()
+    storage = OutputStorage(tmp_path, max_bytes=250)
+    first = make_job(storage, 50, now - 5000)
+    second = make_job(storage, 50, now - 4000)
+    third = make_job(storage, 50, now - 3000)
+    storage.touch(first)  # downloaded just now
+
+    assert storage.collect() == [second]
+    assert storage.usage()["bytes"] == 200
+    assert storage.job_files(first) and storage.job_files(third)
+
+
+def test_recent_jobs_are_never_evicted(tmp_path):
+    storage = OutputStorage(tmp_path, max_bytes=1, min_age_sec=600)
+    make_job(storage, 100, time.time())
+    assert storage.collect() == []
@@ -0,0 +1,48 @@
+import numpy as np
+from waveform import WaveformAnalyzer
+
+
+def test_peaks_levels_halve():
+    analyzer = WaveformAnalyzer(sample_rate=8000)
+    audio = np.zeros(10 * 1024 + 5, dtype=np.float32)
+    audio[3000] = 1.0
+    audio[-1] = -0.5
+    peaks = analyzer.compute_peaks(audio, samples_per_peak=1024, levels=4)
+
+    counts = [len(level["max"]) for level in peaks["levels"]]
+    assert counts == [11, 6, 3, 2]
+    finest = peaks["levels"][0]
+    assert finest["max"][2] == 127
+    assert finest["min"][-1] == -64
+    # Coarse levels keep the extremes of the fine ones
+    assert max(peaks["levels"][-1]["max"]) == 127
+
+
+def test_peaks_stereo_covers_all_channels():
+    analyzer = WaveformAnalyzer(sample_rate=8000)
+    stereo = np.zeros((2, 4096), dtype=np.float32)
+    stereo[1, 100] = -1.0
+    peaks = analyzer.compute_peaks(stereo, samples_per_peak=1024, levels=1)
+    assert peaks["channels"] == 2
+    assert peaks["levels"][0]["min"][0] == -127
+
+
+def test_spectrogram_png():
+    analyzer = WaveformAnalyzer(sample_rate=8000)
+    audio = np.sin(np.arange(80000, dtype=np.float32) * 0.3)
+    image = analyzer.mel_spectrogram(audio, width=128, n_mels=32)
+    assert image.shape == (32, 128)
+    assert image.dtype == np.uint8
+    assert analyzer.spectrogram_png(audio).startswith(b'\x89PNG')
+
+
+def test_overview_of_disk_backed_stereo_track(tmp_path):
+    analyzer = WaveformAnalyzer(sample_rate=8000)
+    stereo = np.random.default_rng(3).standard_normal((2, 300000)).astype(np.float32) * 0.1
+    # Stored frame by frame, as StreamingTrackWriter does
+    frames = np.memmap(tmp_path / "track.f32", dtype=np.float32, mode="w+", shape=stereo.T.shape)
+    frames[:] = stereo.T
+
+    peaks = analyzer.compute_peaks(frames.T, samples_per_peak=1024, levels=2, chunk_peaks=16)
+    assert peaks == analyzer.compute_peaks(stereo, samples_per_peak=1024, levels=2)
+    assert np.array_equal(analyzer.mel_spectrogram(frames.T), analyzer.mel_spectrogram(stereo))
@@ -0,0 +1,61 @@
+"""
+Project Orpheus - Generation Worker
+Pulls queued jobs from the shared job store and runs them.
+
+Run one or more of these on GPU/CPU nodes next to API nodes started with
+ORPHEUS_MODE=api. All nodes must share ORPHEUS_JOB_STORE and ORPHEUS_OUTPUT_DIR.
+"""
+
+import os
+import socket
+import uuid
+
+os.environ.setdefault("ORPHEUS_MODE", "worker")
+
+import api_server
+
+
+def run_worker(worker_id: str, poll_timeout: float = 5.0):
+    """Claim and process jobs until interrupted."""
+    print(f"Worker {worker_id} waiting for jobs from {api_server.JOB_STORE_URL}")
+    
+    while True:
+        claimed = api_server.jobs.claim(worker_id, timeout=poll_timeout)
+        if claimed is None:
+            continue
+        
+        job_id, payload = claimed
+        try:
+            rerender_of = payload.pop("rerender_of", None)
+            request = api_server.GenerationRequest(**payload)
+            
+            if rerender_of:
+                print(f"[{worker_id}] Re-rendering job {rerender_of} as {job_id}")
+                api_server.process_rerender(job_id, rerender_of, request)
+            else:
+                print(f"[{worker_id}] Processing job {job_id}")
+                api_server.process_generation(job_id, request)
+        except Exception as e:
+            # A bad payload fails its job, not the worker
+            print(f"[{worker_id}] Job {job_id} failed: {e}")
+            api_server.jobs.update(job_id, {"status": "failed", "error": str(e)})
+
+
+if __name__ == "__main__":
+    worker_id = os.environ.get("ORPHEUS_WORKER_ID", f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}")
+    
+    # Workers share the output quota with the API nodes
+    api_server.storage.start()
+    
+    # Only start claiming jobs once the model is warm
+    api_server.warmup()
+    if not api_server.ready.is_set():
+        raise SystemExit("Warmup failed; not claiming jobs")
+    
+    try:
+        run_worker(worker_id)
+    except KeyboardInterrupt:
+        print("\nWorker stopped")
+    finally:
+        # Finish writing the last job's files
+        api_server.io_executor.shutdown(wait=True)